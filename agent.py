@@ -3,6 +3,11 @@ from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
+from deadlines import check_deadline, make_callback_handler
+from llm_http import get_async_http_client, get_http_client
+from resilience import wrap_llm
+from structured_logging import make_trace_handler, trace_event, traces_to_stdout
+
 # A simple canonical tool shape is provided by tools.__init__ (example_tool)
 from tools import example_tool
 
@@ -29,11 +34,14 @@ class _FallbackExecutor:
             t = self.tools[0]
             func = t.get("func") if isinstance(t, dict) else getattr(t, "func", None)
             if callable(func):
+                check_deadline("tool_call")
                 try:
                     tool_res = func(payload.get("input"))
                 except Exception:
                     tool_res = None
-        return {"output": tool_res or f"fallback: received {payload.get('input')!r}"}
+        output = tool_res or f"fallback: received {payload.get('input')!r}"
+        trace_event("fallback_invoke", input=payload.get("input"), output=output)
+        return {"output": output}
 
 
 def _import_langchain_components() -> Dict[str, Any]:
@@ -52,12 +60,29 @@ def _import_langchain_components() -> Dict[str, Any]:
             except Exception:
                 from langchain.chat_models import ChatOpenAI  # type: ignore
 
-        from langchain.agents import AgentExecutor
-        from langchain.agents.format_scratchpad import (
-            format_to_openai_function_messages,
-        )
-        from langchain.agents.output_parsers import OpenAIFunctionsAgentOutputParser
-        from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+        try:
+            from langchain.agents import AgentExecutor
+            from langchain.agents.format_scratchpad import (
+                format_to_openai_function_messages,
+            )
+            from langchain.agents.output_parsers import (
+                OpenAIFunctionsAgentOutputParser,
+            )
+        except ImportError:
+            # langchain 1.x moved the classic agent runtime out
+            from langchain_classic.agents import AgentExecutor  # type: ignore
+            from langchain_classic.agents.format_scratchpad import (  # type: ignore
+                format_to_openai_function_messages,
+            )
+            from langchain_classic.agents.output_parsers import (  # type: ignore
+                OpenAIFunctionsAgentOutputParser,
+            )
+        try:
+            from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+            from langchain.tools import Tool
+        except ImportError:
+            from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+            from langchain_core.tools import Tool
 
     return {
         "ChatOpenAI": ChatOpenAI,
@@ -66,6 +91,7 @@ def _import_langchain_components() -> Dict[str, Any]:
         "OpenAIFunctionsAgentOutputParser": OpenAIFunctionsAgentOutputParser,
         "ChatPromptTemplate": ChatPromptTemplate,
         "MessagesPlaceholder": MessagesPlaceholder,
+        "Tool": Tool,
     }
 
 
@@ -74,12 +100,25 @@ def build_agent(
     chat_history: Optional[List[Dict]] | None = None,
     tools: Optional[List] | None = None,
     temperature: float = 0.0,
+    resilient: bool = True,
+    verbose: Optional[bool] = None,
 ) -> Any:
     """Construct and return an AgentExecutor for this example repo.
 
     If LangChain isn't available, returns a lightweight fallback executor
     implementing a minimal `invoke(payload)->dict` contract used by tests.
+
+    LLM clients created here share the process-wide pooled HTTP clients from
+    `llm_http`, so building many executors does not open new connections.
+    When `resilient` is true the LLM is wrapped with hedging and budgeted
+    retries (see `resilience.ResilientLLM`).
+
+    Agent steps are traced through the structured logging pipeline (sampled,
+    off the hot path) unless `verbose` is true, which restores LangChain's
+    stdout output; it defaults to `AGENT_TRACE_TO_STDOUT`.
     """
+    if verbose is None:
+        verbose = traces_to_stdout()
     if chat_history is None:
         chat_history = []
     if tools is None:
@@ -93,11 +132,21 @@ def build_agent(
         OpenAIFunctionsAgentOutputParser = comps["OpenAIFunctionsAgentOutputParser"]
         ChatPromptTemplate = comps["ChatPromptTemplate"]
         MessagesPlaceholder = comps["MessagesPlaceholder"]
+        Tool = comps["Tool"]
 
         if llm is None:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                llm = ChatOpenAI(model="gpt-4-1106-preview", temperature=temperature)
+                llm = ChatOpenAI(
+                    model="gpt-4-1106-preview",
+                    temperature=temperature,
+                    http_client=get_http_client(),
+                    http_async_client=get_async_http_client(),
+                    # retries are handled by the resilience layer when enabled
+                    max_retries=0 if resilient else 2,
+                )
+        if resilient:
+            llm = wrap_llm(llm)
 
         prompt = ChatPromptTemplate.from_messages(
             [
@@ -127,10 +176,25 @@ def build_agent(
             | OpenAIFunctionsAgentOutputParser()
         )
 
-        agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
-        return agent_executor
+        # The deadline handler stops agent iterations of abandoned requests.
+        callbacks = [make_callback_handler()]
+        if not verbose:
+            callbacks.append(make_trace_handler())
+        # AgentExecutor only accepts LangChain tools, not the repo's descriptors
+        lc_tools = [
+            (
+                Tool(name=t["name"], func=t["func"], description=t["description"])
+                if isinstance(t, dict)
+                else t
+            )
+            for t in tools
+        ]
+        agent_executor = AgentExecutor(agent=agent, tools=lc_tools, verbose=verbose)
+        # Constructor callbacks only see the executor's own run; handlers
+        # bound through the run config are inherited by LLM and tool runs.
+        return agent_executor.with_config(callbacks=callbacks)
     except Exception:
-        return _FallbackExecutor(agent=None, tools=tools, verbose=True)
+        return _FallbackExecutor(agent=None, tools=tools, verbose=verbose)
 
 
 if __name__ == "__main__":
@@ -1,24 +1,53 @@
 import asyncio
 import json
+import logging
 import os
 import time
+import uuid
+from contextlib import asynccontextmanager
 from typing import Any, AsyncGenerator, Dict, List, Optional
 
 from fastapi import Body, FastAPI, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
 # Local imports and app
 from agent import build_agent
+from deadlines import (
+    Deadline,
+    DeadlineExceeded,
+    RequestCancelled,
+    cancellation_stats,
+    count_cancelled_stream,
+    run_in_scope,
+)
+from jobs import FINISHED, JobManager, QueueFull
+from llm_http import aclose_http_clients, pool_stats
+from resilience import resilience_stats
+from static_assets import PrecompressedStaticFiles
+from structured_logging import (
+    configure_logging,
+    logging_stats,
+    reset_request_context,
+    set_request_context,
+    should_sample,
+)
 
 # OpenAPI tags
 TAGS = [
     {"name": "agent", "description": "Agent invocation and streaming endpoints."},
     {"name": "tools", "description": "Tool discovery and execution endpoints."},
+    {"name": "jobs", "description": "Asynchronous agent invocation jobs."},
 ]
 
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    # Pooled LLM connections are closed on the loop that opened them.
+    await aclose_http_clients()
+
+
 app = FastAPI(
     title="ai-agent API",
     version="0.1.0",
@@ -28,15 +57,65 @@ app = FastAPI(
         "inspect available tools."
     ),
     openapi_tags=TAGS,
+    lifespan=lifespan,
 )
 
-# Serve static web UI when available (built via Docker multi-stage)
-if os.path.isdir("webui_dist"):
-    app.mount(
-        "/",
-        StaticFiles(directory="webui_dist", html=True),
-        name="webui",
-    )
+# Structured logging: JSON lines written by a background thread.
+configure_logging()
+access_logger = logging.getLogger("agent.access")
+cache_logger = logging.getLogger("agent.semantic_cache")
+
+
+class RequestContextMiddleware:
+    """Assign each request a correlation id and log it on completion.
+
+    Uses the incoming `X-Request-ID` header when present, echoes it on the
+    response, decides whether the request's agent steps are traced and
+    writes one access log record through the non-blocking pipeline.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        tokens = set_request_context(request_id, should_sample())
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            access_logger.info(
+                "request",
+                extra={
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                },
+            )
+            reset_request_context(tokens)
+
+
+app.add_middleware(RequestContextMiddleware)
 
 # API auth token (runtime). For development put it in .env or docker-compose env_file.
 API_KEY = os.environ.get("AGENT_API_KEY")
@@ -74,6 +153,14 @@ class InvokeRequest(BaseModel):
     tools: Optional[List[str]] = Field(
         None, description="Optional list of tool names to allow"
     )
+    timeout_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description=(
+            "Per-request deadline in milliseconds; work is cancelled once it "
+            "passes. The `X-Request-Timeout-Ms` header is also honoured."
+        ),
+    )
 
 
 class ToolRunRequest(BaseModel):
@@ -103,9 +190,46 @@ class HealthResponse(BaseModel):
     status: str = Field(..., json_schema_extra={"example": "ok"})
 
 
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Job identifier")
+    status: str = Field(
+        ...,
+        description="One of queued, running, succeeded, failed",
+        json_schema_extra={"example": "queued"},
+    )
+    created_at: float = Field(..., description="Submission time (unix seconds)")
+    updated_at: float = Field(..., description="Last status change (unix seconds)")
+    expires_at: float = Field(..., description="When a finished job is discarded")
+    result: Optional[InvokeResponse] = Field(
+        None, description="Invoke result once the job succeeded"
+    )
+    error: Optional[str] = Field(None, description="Error message if it failed")
+
+
+class MetricsResponse(BaseModel):
+    http_pool: Dict[str, Any] = Field(
+        default_factory=dict, description="Shared LLM HTTP pool connection reuse"
+    )
+    resilience: Dict[str, Any] = Field(
+        default_factory=dict, description="LLM hedging and retry counters"
+    )
+    cancellation: Dict[str, Any] = Field(
+        default_factory=dict, description="Deadline and cancellation counters"
+    )
+    logging: Dict[str, Any] = Field(
+        default_factory=dict, description="Log pipeline queue counters"
+    )
+
+
 # Build a shared executor on first request. Uses lazy imports in agent.build_agent().
 _executor = None
 
+# Optional semantic response cache, enabled with AGENT_SEMANTIC_CACHE=1.
+_semantic_cache = None
+
+# Background job manager for /v1/jobs, created on first use.
+_job_manager = None
+
 # Module-level Body examples to avoid function-call defaults warnings (B008)
 INVOKE_BODY = Body(
     ...,
@@ -122,6 +246,16 @@ RUN_TOOL_BODY = Body(
     examples={"default": {"summary": "Example tool run", "value": {"input": "abc"}}},
 )
 
+JOB_BODY = Body(
+    ...,
+    examples={
+        "default": {
+            "summary": "Example job",
+            "value": {"input": "Research and summarize ...", "timeout_ms": 600000},
+        }
+    },
+)
+
 INVOKE_STREAM_BODY = Body(
     ...,
     examples={
@@ -137,6 +271,16 @@ INVOKE_STREAM_BODY = Body(
 # a function-call default (B008 lint).
 LOGIN_BODY = Body(...)
 LOGOUT_HEADER = Header(None)
+TIMEOUT_HEADER = Header(None, alias="X-Request-Timeout-Ms")
+
+# Server-side default deadline in milliseconds (unset means no deadline).
+DEFAULT_TIMEOUT_MS = os.environ.get("AGENT_REQUEST_TIMEOUT_MS")
+# How often (seconds) to poll for client disconnects while work is running.
+DISCONNECT_POLL_INTERVAL = 0.1
+# Sentinel returned by next() when a streaming executor is exhausted.
+_STREAM_DONE = object()
+# How often (seconds) job event streams re-check the job store.
+JOB_POLL_INTERVAL = 0.25
 
 
 def get_executor():
@@ -151,6 +295,52 @@ def get_executor():
     return _executor
 
 
+# Slack front end, mounted at /slack/events when credentials are configured.
+slack_dispatcher = None
+if os.environ.get("SLACK_BOT_TOKEN") and os.environ.get("SLACK_SIGNING_SECRET"):
+    from slack_app import mount_slack
+
+    slack_dispatcher = mount_slack(app, lambda: get_executor())
+
+
+def get_semantic_cache():
+    """Return the shared semantic cache, or None when it is disabled.
+
+    Configured via `AGENT_SEMANTIC_CACHE_*` environment variables; NumPy is
+    only imported when the cache is enabled.
+    """
+    global _semantic_cache
+    if os.environ.get("AGENT_SEMANTIC_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+    if _semantic_cache is None:
+        import atexit
+
+        from semantic_cache import SemanticCache, make_embedder
+
+        _semantic_cache = SemanticCache(
+            embedder=make_embedder(
+                os.environ.get("AGENT_SEMANTIC_CACHE_EMBEDDER", "openai")
+            ),
+            threshold=float(os.environ.get("AGENT_SEMANTIC_CACHE_THRESHOLD", 0.92)),
+            capacity=int(os.environ.get("AGENT_SEMANTIC_CACHE_CAPACITY", 4096)),
+            path=os.environ.get("AGENT_SEMANTIC_CACHE_PATH") or None,
+        )
+        atexit.register(_semantic_cache.flush)
+    return _semantic_cache
+
+
+def get_job_manager() -> JobManager:
+    """Return the shared job manager, creating it lazily on first use.
+
+    Jobs resolve the executor through `get_executor` when they start, so they
+    share the same executor as the synchronous endpoints.
+    """
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager.from_env(lambda: get_executor())
+    return _job_manager
+
+
 def _build_payload(req: InvokeRequest) -> Dict[str, Any]:
     """Convert an InvokeRequest into the internal executor payload shape.
 
@@ -159,6 +349,69 @@ def _build_payload(req: InvokeRequest) -> Dict[str, Any]:
     return {"input": req.input, "chat_history": req.chat_history or []}
 
 
+def _request_timeout(req: InvokeRequest, header_ms: Optional[int]) -> Optional[float]:
+    """Return the request timeout in seconds from the body, header and default.
+
+    The tightest of the provided timeouts wins; None means no deadline.
+    """
+    candidates = [req.timeout_ms, header_ms]
+    if DEFAULT_TIMEOUT_MS:
+        candidates.append(int(DEFAULT_TIMEOUT_MS))
+    timeouts = [ms for ms in candidates if ms]
+    return min(timeouts) / 1000 if timeouts else None
+
+
+async def _cache_lookup(cache, text: str, deadline: Deadline):
+    """Look up `text` in the semantic cache; failures count as a miss (None).
+
+    Runs inside the request deadline, so the embedding call is clamped to
+    the time the request has left.
+    """
+    try:
+        return await asyncio.to_thread(run_in_scope, deadline, cache.lookup, text)
+    except RequestCancelled:
+        raise
+    except Exception:
+        cache_logger.warning("semantic cache lookup failed", exc_info=True)
+        return None
+
+
+async def _cache_store(cache, text: str, entry: Dict[str, Any], vector) -> None:
+    """Store an answer; failures are logged and never fail the request."""
+    try:
+        # storing may flush the index to disk; keep it off the event loop
+        await asyncio.to_thread(cache.store, text, entry, vector)
+    except Exception:
+        cache_logger.warning("semantic cache store failed", exc_info=True)
+
+
+def _make_deadline(req: InvokeRequest, header_ms: Optional[int]) -> Deadline:
+    """Build the request deadline, starting now (see `_request_timeout`)."""
+    return Deadline(_request_timeout(req, header_ms))
+
+
+async def _watch_deadline(deadline: Deadline, request: Optional[Request]) -> None:
+    """Cancel `deadline` when it expires or the client disconnects."""
+    while not deadline.cancelled:
+        if deadline.expired:
+            deadline.cancel("deadline")
+            return
+        if request is not None and await request.is_disconnected():
+            deadline.cancel("disconnect")
+            return
+        remaining = deadline.remaining()
+        delay = DISCONNECT_POLL_INTERVAL
+        await asyncio.sleep(delay if remaining is None else min(delay, remaining))
+
+
+def _raise_cancelled(exc: RequestCancelled) -> None:
+    """Translate a cancelled request into an HTTP error."""
+    if isinstance(exc, DeadlineExceeded):
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    # 499: client closed request (nginx convention); nobody reads the body
+    raise HTTPException(status_code=499, detail=str(exc)) from exc
+
+
 def _serialize_tool(t: Any) -> Dict[str, str]:
     """Normalize a tool object into a simple dict with `name` and `description`.
 
@@ -214,13 +467,47 @@ def _issue_token() -> LoginResponse:
     return LoginResponse(token=token, expires_at=exp)
 
 
-async def _invoke_executor_async(executor, payload: dict) -> dict:
+async def _invoke_executor_async(
+    executor,
+    payload: dict,
+    deadline: Optional[Deadline] = None,
+    request: Optional[Request] = None,
+) -> dict:
     """Run the executor.invoke in a thread and return the result.
 
     Executors are potentially blocking (heavy LLM calls), so this helper
     delegates to a thread pool to keep the FastAPI event loop responsive.
+
+    With a `deadline`, the thread runs with it attached so the executor's
+    checkpoints can stop early; this coroutine returns as soon as the
+    deadline expires or the client disconnects, raising `RequestCancelled`.
     """
-    return await asyncio.to_thread(executor.invoke, payload)
+    if deadline is None:
+        return await asyncio.to_thread(executor.invoke, payload)
+    return await _run_cancellable(deadline, request, executor.invoke, payload)
+
+
+async def _run_cancellable(
+    deadline: Deadline, request: Optional[Request], fn, *args
+) -> Any:
+    """Run `fn(*args)` in a thread with `deadline` attached.
+
+    Returns the result, or raises `RequestCancelled` as soon as the deadline
+    expires or the client disconnects, without waiting for the thread.
+    """
+    work = asyncio.ensure_future(asyncio.to_thread(run_in_scope, deadline, fn, *args))
+    watcher = asyncio.ensure_future(_watch_deadline(deadline, request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if work.done():
+        return work.result()
+    # The thread stops at its next checkpoint; retrieve its outcome so an
+    # eventual RequestCancelled is not reported as unhandled.
+    work.add_done_callback(lambda t: t.cancelled() or t.exception())
+    deadline.check()
+    raise RequestCancelled("request cancelled")
 
 
 @app.post(
@@ -232,6 +519,7 @@ async def _invoke_executor_async(executor, payload: dict) -> dict:
 async def invoke(
     req: InvokeRequest = INVOKE_BODY,
     authorization: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[int] = TIMEOUT_HEADER,
     request: Request = None,
 ):
     """Invoke the agent synchronously and return structured response.
@@ -244,15 +532,43 @@ async def invoke(
 
     payload = _build_payload(req)
     start = time.time()
+    # Only stateless requests are cacheable; history changes the answer.
+    cache = get_semantic_cache() if not payload["chat_history"] else None
+    deadline = _make_deadline(req, x_request_timeout_ms)
+    lookup = None
+    if cache is not None:
+        try:
+            lookup = await _cache_lookup(cache, req.input, deadline)
+        except RequestCancelled as e:
+            _raise_cancelled(e)
+        if lookup is not None and lookup.hit:
+            return {
+                "output": lookup.value.get("output"),
+                "used_tools": lookup.value.get("used_tools", []),
+                "metadata": {
+                    "duration_ms": int((time.time() - start) * 1000),
+                    "semantic_cache": lookup.metadata(),
+                },
+            }
     try:
-        out = await _invoke_executor_async(executor, payload)
+        out = await _invoke_executor_async(executor, payload, deadline, request)
+    except RequestCancelled as e:
+        _raise_cancelled(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
     duration = int((time.time() - start) * 1000)
+    metadata: Dict[str, Any] = {"duration_ms": duration}
+    if lookup is not None:
+        metadata["semantic_cache"] = lookup.metadata()
+        entry = {
+            "output": out.get("output"),
+            "used_tools": out.get("used_tools", []),
+        }
+        await _cache_store(cache, req.input, entry, lookup.vector)
     return {
         "output": out.get("output"),
         "used_tools": out.get("used_tools", []),
-        "metadata": {"duration_ms": duration},
+        "metadata": metadata,
     }
 
 
@@ -353,6 +669,93 @@ async def run_tool(
     raise HTTPException(status_code=404, detail="Tool not found")
 
 
+@app.post(
+    "/v1/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    tags=["jobs"],
+    summary="Submit an asynchronous agent job",
+)
+async def submit_job(
+    req: InvokeRequest = JOB_BODY,
+    authorization: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[int] = TIMEOUT_HEADER,
+):
+    """Queue an agent invocation and return its job id immediately.
+
+    Poll `/v1/jobs/{job_id}` or subscribe to `/v1/jobs/{job_id}/events` for
+    the result. A request deadline, if given, applies once the job starts.
+    Returns 429 when the job queue is full.
+    """
+    check_auth(authorization)
+    manager = get_job_manager()
+    timeout = _request_timeout(req, x_request_timeout_ms)
+    try:
+        return await asyncio.to_thread(manager.submit, _build_payload(req), timeout)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e)) from e
+
+
+@app.get(
+    "/v1/jobs/{job_id}",
+    response_model=JobResponse,
+    tags=["jobs"],
+    summary="Get the status and result of a job",
+)
+async def get_job(job_id: str, authorization: Optional[str] = Header(None)):
+    """Return the job's current status, and its result once finished.
+
+    Returns 404 for unknown or expired jobs.
+    """
+    check_auth(authorization)
+    job = await asyncio.to_thread(get_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def _job_event_generator(job_id: str) -> AsyncGenerator[str, None]:
+    """Yield an SSE event for each job status change until it finishes."""
+    manager = get_job_manager()
+    last_update = None
+    while True:
+        job = await asyncio.to_thread(manager.get, job_id)
+        if job is None:
+            yield f"data: {json.dumps({'error': 'Job not found'})}\n\n"
+            return
+        if job["updated_at"] != last_update:
+            last_update = job["updated_at"]
+            event = JobResponse(**job).model_dump(exclude_none=True)
+            yield f"data: {json.dumps(event)}\n\n"
+        if job["status"] in FINISHED:
+            return
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+@app.get(
+    "/v1/jobs/{job_id}/events",
+    tags=["jobs"],
+    summary="Subscribe to job status changes (SSE)",
+    responses={
+        200: {
+            "description": "Server-Sent Events with a JobResponse per status change.",
+            "content": {"text/event-stream": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def job_events(job_id: str, authorization: Optional[str] = Header(None)):
+    """Stream job status changes as SSE `data:` events.
+
+    The stream ends after the event carrying the final status and result.
+    """
+    check_auth(authorization)
+    if await asyncio.to_thread(get_job_manager().get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        _job_event_generator(job_id), media_type="text/event-stream"
+    )
+
+
 @app.get(
     "/health",
     response_model=HealthResponse,
@@ -364,38 +767,87 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get(
+    "/v1/metrics",
+    response_model=MetricsResponse,
+    tags=["agent"],
+    summary="Runtime metrics",
+)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Return runtime metrics such as LLM connection reuse and hedging.
+
+    Authentication is enforced when configured.
+    """
+    check_auth(authorization)
+    return {
+        "http_pool": pool_stats(),
+        "resilience": resilience_stats(),
+        "cancellation": cancellation_stats(),
+        "logging": logging_stats(),
+    }
+
+
 async def _chunk_string(s: str, chunk_size: int = 256):
     """Yield successive chunks from a string for streaming fallback."""
     for i in range(0, len(s), chunk_size):
         yield s[i : i + chunk_size]
 
 
-async def _sse_event_generator(payload: dict) -> AsyncGenerator[str, None]:
+async def _sse_event_generator(
+    payload: dict,
+    deadline: Optional[Deadline] = None,
+    request: Optional[Request] = None,
+) -> AsyncGenerator[str, None]:
     """Return an SSE generator yielding JSON chunks for the payload's output.
 
     If underlying executor provides a streaming generator (attribute
     `stream_invoke`), use it. Otherwise fallback to chunking the full
     output string.
+
+    Pieces are pulled from the executor one at a time, so the stream stops
+    at the next piece once `deadline` expires or the client disconnects.
+    An `error` event is sent when the deadline was exceeded or the executor
+    failed; only cancellations count as a cancelled stream.
     """
+    if deadline is None:
+        deadline = Deadline()
     executor = get_executor()
     stream_fn = getattr(executor, "stream_invoke", None)
-    if callable(stream_fn):
-        def gen():
-            for piece in stream_fn(payload):
-                yield piece
-
-        loop = asyncio.get_running_loop()
-        for piece in await loop.run_in_executor(None, lambda: list(gen())):
-            data = json.dumps({"output": piece})
-            yield f"data: {data}\n\n"
+    finished = False
+    try:
+        if callable(stream_fn):
+            pieces = await _run_cancellable(
+                deadline, request, lambda: iter(stream_fn(payload))
+            )
+            while True:
+                piece = await _run_cancellable(
+                    deadline, request, next, pieces, _STREAM_DONE
+                )
+                if piece is _STREAM_DONE:
+                    break
+                data = json.dumps({"output": piece})
+                yield f"data: {data}\n\n"
+        else:
+            # Fallback: call invoke and chunk the result
+            out = await _invoke_executor_async(executor, payload, deadline, request)
+            text = out.get("output") or ""
+            async for chunk in _chunk_string(text):
+                data = json.dumps({"output": chunk})
+                yield f"data: {data}\n\n"
+        finished = True
+    except DeadlineExceeded as e:
+        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    except RequestCancelled:
         return
-
-    # Fallback: call invoke and chunk the result
-    out = await _invoke_executor_async(executor, payload)
-    text = out.get("output") or ""
-    async for chunk in _chunk_string(text):
-        data = json.dumps({"output": chunk})
-        yield f"data: {data}\n\n"
+    except Exception as e:
+        # An executor failure is not a disconnect; report it and end the stream.
+        finished = True
+        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        if not finished:
+            # Covers the server cancelling this generator on disconnect too.
+            deadline.cancel("disconnect")
+            count_cancelled_stream()
 
 
 @app.post(
@@ -412,18 +864,31 @@ async def _sse_event_generator(payload: dict) -> AsyncGenerator[str, None]:
 async def invoke_stream(
     req: InvokeRequest = INVOKE_STREAM_BODY,
     authorization: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[int] = TIMEOUT_HEADER,
+    request: Request = None,
 ):
     """Invoke the agent and return Server-Sent Events (SSE) streaming output.
 
     The endpoint yields JSON payloads as SSE `data:` events. When a
     stream-capable executor is present it will be used; otherwise the
-    full output is chunked and sent.
+    full output is chunked and sent. Deadlines work as for `/v1/invoke`.
     """
     check_auth(authorization)
     payload = {"input": req.input, "chat_history": req.chat_history or []}
+    deadline = _make_deadline(req, x_request_timeout_ms)
 
     async def event_stream():
-        async for ev in _sse_event_generator(payload):
+        async for ev in _sse_event_generator(payload, deadline, request):
             yield ev
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# Serve static web UI when available (built via Docker multi-stage). Mounted
+# last: a mount at "/" matches every path, so it must not shadow API routes.
+if os.path.isdir("webui_dist"):
+    app.mount(
+        "/",
+        PrecompressedStaticFiles(directory="webui_dist", html=True),
+        name="webui",
+    )
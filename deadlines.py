@@ -0,0 +1,186 @@
+"""Per-request deadlines with cooperative cancellation of executor work.
+
+Executors run in worker threads that cannot be interrupted. Instead, the API
+attaches a `Deadline` to the request context; the executor checks it at
+cooperative checkpoints (before each LLM HTTP call, tool call and agent
+iteration) and aborts with `RequestCancelled` once the deadline passes or
+the client disconnects. LLM HTTP timeouts are clamped to the remaining time.
+
+`contextvars` carries the deadline into threads started with
+`asyncio.to_thread`; use `run_in_scope` for other thread pools.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_current: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "agent_deadline", default=None
+)
+
+_LOCK = threading.Lock()
+
+# Counters for work avoided by cancelling abandoned requests.
+_STATS: Dict[str, int] = {
+    "requests_with_deadline": 0,
+    "deadline_exceeded": 0,
+    "disconnects": 0,
+    "llm_calls_skipped": 0,
+    "tool_calls_skipped": 0,
+    "iterations_skipped": 0,
+    "streams_cancelled": 0,
+}
+
+
+def _count(key: str) -> None:
+    with _LOCK:
+        _STATS[key] = _STATS.get(key, 0) + 1
+
+
+def cancellation_stats() -> Dict[str, int]:
+    """Return a snapshot of deadline and cancellation counters."""
+    with _LOCK:
+        return dict(_STATS)
+
+
+def reset_cancellation_stats() -> None:
+    """Zero all deadline and cancellation counters (used by tests)."""
+    with _LOCK:
+        for key in _STATS:
+            _STATS[key] = 0
+
+
+def count_cancelled_stream() -> None:
+    """Record a streaming response that stopped before completion."""
+    _count("streams_cancelled")
+
+
+class RequestCancelled(Exception):
+    """Raised at a checkpoint when the request was abandoned."""
+
+
+class DeadlineExceeded(RequestCancelled):
+    """Raised at a checkpoint when the request deadline has passed."""
+
+
+class Deadline:
+    """A point in time after which request work should stop.
+
+    `timeout` is in seconds; None means no deadline, but the request can
+    still be cancelled (e.g. on client disconnect).
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        if timeout is not None:
+            _count("requests_with_deadline")
+        self._cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, clamped at zero; None when there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Mark the request abandoned; the first reason wins."""
+        if self._cancelled.is_set():
+            return
+        self.reason = reason
+        self._cancelled.set()
+        if reason == "deadline":
+            _count("deadline_exceeded")
+        elif reason == "disconnect":
+            _count("disconnects")
+
+    def check(self, kind: Optional[str] = None) -> None:
+        """Raise if the request is cancelled or past its deadline.
+
+        `kind` (`llm_call`, `tool_call`, `iteration`) records which unit of
+        work was skipped in the cancellation counters.
+        """
+        if self.expired and not self.cancelled:
+            self.cancel("deadline")
+        if not self.cancelled:
+            return
+        if kind:
+            _count(f"{kind}s_skipped")
+        if self.reason == "deadline":
+            raise DeadlineExceeded("request deadline exceeded")
+        raise RequestCancelled(f"request cancelled: {self.reason}")
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline attached to the current context, if any."""
+    return _current.get()
+
+
+def check_deadline(kind: Optional[str] = None) -> None:
+    """Checkpoint helper: raise if the current request was abandoned."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check(kind)
+
+
+def remaining_timeout(default: Optional[float] = None) -> Optional[float]:
+    """Return `default` clamped to the current deadline's remaining time."""
+    deadline = _current.get()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return default
+    if default is None:
+        return remaining
+    return min(default, remaining)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Attach `deadline` to the current context for the duration of the block."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def run_in_scope(deadline: Optional[Deadline], fn: Callable, *args, **kwargs) -> Any:
+    """Call `fn` with `deadline` attached; intended as a thread entry point."""
+    with deadline_scope(deadline):
+        return fn(*args, **kwargs)
+
+
+def make_callback_handler() -> Any:
+    """Return a LangChain callback handler that checkpoints agent work.
+
+    Raises at the start of each LLM call, tool call and agent action once
+    the current request is cancelled, stopping the agent loop early.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class DeadlineCallbackHandler(BaseCallbackHandler):
+        raise_error = True
+
+        def on_llm_start(self, *args, **kwargs):
+            check_deadline("llm_call")
+
+        def on_chat_model_start(self, *args, **kwargs):
+            check_deadline("llm_call")
+
+        def on_tool_start(self, *args, **kwargs):
+            check_deadline("tool_call")
+
+        def on_agent_action(self, *args, **kwargs):
+            check_deadline("iteration")
+
+    return DeadlineCallbackHandler()
@@ -0,0 +1,230 @@
+"""Asynchronous job processing for long-running agent invocations.
+
+Clients submit an invoke payload, get a job id back immediately and poll
+(or subscribe to) the job instead of holding an HTTP connection open for
+the whole agent run.
+
+- `JobStore` persists jobs and results in SQLite with a TTL.
+- `JobManager` runs jobs on a bounded worker pool over the shared executor
+  and rejects submissions with `QueueFull` once the backlog is full. Jobs
+  are not resumed across restarts: on start-up, jobs a previous process
+  left queued or running are marked failed, so the database should not be
+  shared by concurrently running processes.
+
+Configuration (environment variables, read by `JobManager.from_env`):
+- `AGENT_JOBS_DB`: SQLite database path (default `jobs.db`)
+- `AGENT_JOBS_TTL`: seconds a finished job is kept (default 3600)
+- `AGENT_JOBS_WORKERS`: concurrent jobs (default 4)
+- `AGENT_JOBS_MAX_QUEUE`: queued plus running jobs accepted (default 100)
+"""
+
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from deadlines import Deadline, run_in_scope
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised when the job backlog is at capacity."""
+
+
+class JobStore:
+    """SQLite-backed job store; expired rows are purged lazily.
+
+    Only finished jobs expire: the TTL counts from the move to a final
+    status, so queued and running jobs are kept however long they take.
+    """
+
+    def __init__(self, path: str = "jobs.db", ttl: float = 3600.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)"
+            )
+
+    def create(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, updated_at,"
+                " expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(request), now, now, now + self.ttl),
+            )
+        return self.get(job_id)
+
+    def update(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Set a job's status; a finished job expires `ttl` after this update."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?,"
+                " expires_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    now,
+                    now + self.ttl,
+                    job_id,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job as a dict, or None if unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?"
+                " AND (status NOT IN (?, ?) OR expires_at > ?)",
+                (job_id, *FINISHED, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def fail_unfinished(self, error: str) -> int:
+        """Mark every queued or running job failed; returns how many changed."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?,"
+                " expires_at = ? WHERE status IN (?, ?)",
+                (FAILED, error, now, now + self.ttl, QUEUED, RUNNING),
+            )
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        """Delete expired jobs and return how many were removed."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND expires_at <= ?",
+                (*FINISHED, time.time()),
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """Run submitted jobs on a bounded worker pool and record the outcome."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        executor_provider: Callable[[], Any],
+        workers: int = 4,
+        max_queue: int = 100,
+    ):
+        self.store = store
+        self.executor_provider = executor_provider
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(max_queue)
+        # Workers of a previous process are gone; settle their jobs so
+        # pollers and event streams see a final status.
+        store.fail_unfinished("interrupted by restart")
+
+    @classmethod
+    def from_env(cls, executor_provider: Callable[[], Any]) -> "JobManager":
+        """Build a manager configured from `AGENT_JOBS_*` environment variables."""
+        store = JobStore(
+            path=os.environ.get("AGENT_JOBS_DB", "jobs.db"),
+            ttl=float(os.environ.get("AGENT_JOBS_TTL", 3600)),
+        )
+        return cls(
+            store,
+            executor_provider,
+            workers=int(os.environ.get("AGENT_JOBS_WORKERS", 4)),
+            max_queue=int(os.environ.get("AGENT_JOBS_MAX_QUEUE", 100)),
+        )
+
+    def submit(
+        self, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Persist and enqueue a job; raises `QueueFull` when at capacity.
+
+        `timeout` (seconds) bounds the run once a worker picks the job up.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("job queue is full")
+        try:
+            self.store.purge_expired()
+            job = self.store.create(payload)
+            # run in the submitter's context so logs keep its correlation id
+            ctx = contextvars.copy_context()
+            self._pool.submit(ctx.run, self._run, job["id"], payload, timeout)
+        except Exception:
+            self._slots.release()
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _run(
+        self, job_id: str, payload: Dict[str, Any], timeout: Optional[float]
+    ) -> None:
+        try:
+            self.store.update(job_id, RUNNING)
+            start = time.time()
+            try:
+                executor = self.executor_provider()
+                out = run_in_scope(Deadline(timeout), executor.invoke, payload)
+            except Exception as e:
+                self.store.update(job_id, FAILED, error=str(e))
+                return
+            duration = int((time.time() - start) * 1000)
+            result = {
+                "output": out.get("output"),
+                "used_tools": out.get("used_tools", []),
+                "metadata": {"duration_ms": duration},
+            }
+            self.store.update(job_id, SUCCEEDED, result=result)
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+        self.store.close()
@@ -0,0 +1,256 @@
+"""Process-wide pooled HTTP clients shared by every LLM client.
+
+`build_agent` used to let each `ChatOpenAI` create its own HTTP client, so
+every executor paid fresh TCP/TLS handshakes. The clients here are created
+once per process and injected into all LLM clients so connections are kept
+alive and reused across executors and requests. Each outgoing request is
+also checked against the current request deadline (see `deadlines`).
+
+httpx async connection pools are bound to the event loop that opened them,
+so `get_async_http_client` returns a facade that sends through one pooled
+client per event loop (the serving loop, the Slack worker loop, ad-hoc
+`asyncio.run` callers). Call `aclose_http_clients` from the app's shutdown
+hook.
+
+Configuration (environment variables):
+- `AGENT_HTTP_MAX_CONNECTIONS`: total pool size (default 100)
+- `AGENT_HTTP_MAX_KEEPALIVE`: idle keep-alive connections kept (default 20)
+- `AGENT_HTTP_KEEPALIVE_EXPIRY`: idle connection lifetime in seconds (default 30)
+- `AGENT_HTTP_TIMEOUT`: read/write/pool timeout in seconds (default 60)
+- `AGENT_HTTP_CONNECT_TIMEOUT`: connect timeout in seconds (default 5)
+- `AGENT_HTTP2`: set to `0` to disable HTTP/2 (used only when `h2` is installed)
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from deadlines import check_deadline, remaining_timeout
+
+_LOCK = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional["_LoopLocalAsyncClient"] = None
+# One pooled client per event loop, dropped when the loop is collected.
+_loop_clients: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]"
+) = weakref.WeakKeyDictionary()
+
+# Connection-reuse counters, updated from httpx event hooks / httpcore traces.
+_STATS: Dict[str, int] = {"requests": 0, "connections_opened": 0}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def http2_enabled() -> bool:
+    """Return True when HTTP/2 is requested and the `h2` package is available."""
+    if os.environ.get("AGENT_HTTP2", "1").lower() in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def pool_limits() -> httpx.Limits:
+    """Build the connection pool limits from the environment."""
+    return httpx.Limits(
+        max_connections=_env_int("AGENT_HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int("AGENT_HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("AGENT_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def pool_timeout() -> httpx.Timeout:
+    """Build the default client timeout from the environment."""
+    return httpx.Timeout(
+        _env_float("AGENT_HTTP_TIMEOUT", 60.0),
+        connect=_env_float("AGENT_HTTP_CONNECT_TIMEOUT", 5.0),
+    )
+
+
+def _count(key: str) -> None:
+    with _LOCK:
+        _STATS[key] += 1
+
+
+def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    # httpcore emits connect_tcp only when a new connection is established;
+    # requests served from a pooled connection skip it.
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections_opened")
+
+
+async def _atrace(event_name: str, info: Dict[str, Any]) -> None:
+    _trace(event_name, info)
+
+
+def _apply_deadline(request: httpx.Request) -> None:
+    # Abort before sending when the request was abandoned, and never wait
+    # longer than the time left until the request deadline.
+    check_deadline("llm_call")
+    remaining = remaining_timeout()
+    if remaining is None:
+        return
+    timeout = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        key: remaining if timeout.get(key) is None else min(timeout[key], remaining)
+        for key in ("connect", "read", "write", "pool")
+    }
+
+
+def _on_request(request: httpx.Request) -> None:
+    _apply_deadline(request)
+    _count("requests")
+    request.extensions["trace"] = _trace
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    _apply_deadline(request)
+    _count("requests")
+    request.extensions["trace"] = _atrace
+
+
+def get_http_client() -> httpx.Client:
+    """Return the shared synchronous HTTP client, creating it on first use."""
+    global _sync_client
+    with _LOCK:
+        if _sync_client is None:
+            _sync_client = httpx.Client(
+                http2=http2_enabled(),
+                limits=pool_limits(),
+                timeout=pool_timeout(),
+                event_hooks={"request": [_on_request]},
+            )
+        return _sync_client
+
+
+def _loop_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        client = _loop_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=http2_enabled(),
+                limits=pool_limits(),
+                timeout=pool_timeout(),
+                event_hooks={"request": [_aon_request]},
+            )
+            _loop_clients[loop] = client
+        return client
+
+
+class _LoopLocalAsyncClient(httpx.AsyncClient):
+    """AsyncClient facade sending through the running loop's pooled client.
+
+    Requests are built here (so client defaults such as the timeout apply)
+    and sent by the client owned by the current event loop.
+    """
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await _loop_client().send(request, **kwargs)
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared asynchronous HTTP client, creating it on first use.
+
+    Safe to use from any event loop: each loop gets its own connection pool.
+    """
+    global _async_client
+    with _LOCK:
+        if _async_client is None:
+            _async_client = _LoopLocalAsyncClient(timeout=pool_timeout())
+        return _async_client
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return a snapshot of connection-reuse metrics for the shared clients.
+
+    `reused_requests` counts requests served over an already-open connection;
+    `reuse_ratio` is that count divided by all requests (0.0 when idle).
+    """
+    with _LOCK:
+        requests = _STATS["requests"]
+        opened = _STATS["connections_opened"]
+    reused = max(requests - opened, 0)
+    return {
+        "requests": requests,
+        "connections_opened": opened,
+        "reused_requests": reused,
+        "reuse_ratio": (reused / requests) if requests else 0.0,
+        "http2": http2_enabled(),
+    }
+
+
+def _detach_clients():
+    global _sync_client, _async_client
+    with _LOCK:
+        sync_client, facade = _sync_client, _async_client
+        loop_clients = list(_loop_clients.items())
+        _sync_client = None
+        _async_client = None
+        _loop_clients.clear()
+        for key in _STATS:
+            _STATS[key] = 0
+    if sync_client is not None:
+        sync_client.close()
+    return facade, loop_clients
+
+
+def _close_on_owner(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient):
+    # A loop's connections can only be closed on that loop; clients of loops
+    # that are gone or idle while another loop runs are left to GC.
+    if loop.is_closed():
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        loop.run_until_complete(client.aclose())
+
+
+def close_http_clients() -> None:
+    """Close and forget the shared clients and reset metrics.
+
+    Intended for tests and scripts; the next `get_*` call creates fresh
+    clients. From a running event loop use `aclose_http_clients` instead.
+    """
+    facade, loop_clients = _detach_clients()
+    for loop, client in loop_clients:
+        _close_on_owner(loop, client)
+    if facade is not None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(facade.aclose())
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared clients from a running event loop (app shutdown)."""
+    facade, loop_clients = _detach_clients()
+    current = asyncio.get_running_loop()
+    for loop, client in loop_clients:
+        if loop is current:
+            await client.aclose()
+        else:
+            _close_on_owner(loop, client)
+    if facade is not None:
+        await facade.aclose()
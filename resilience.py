@@ -0,0 +1,393 @@
+"""Hedged and retried LLM calls to cut tail latency.
+
+`ResilientLLM` wraps an LLM backend (anything exposing `invoke`, optionally
+`ainvoke`) and:
+
+- issues a hedged duplicate request when the first one has not answered
+  within the configured latency percentile of starting, returning whichever
+  succeeds first and cancelling the other; hedges draw on their own budget
+  and are skipped while the attempt pool has no idle worker, so hedging
+  cannot double load when the process is already saturated;
+- retries transient errors with full-jitter exponential backoff, limited by
+  a shared retry budget so retries cannot amplify an outage.
+
+Synchronous calls run attempts on a shared thread pool; a losing attempt
+that is already running cannot be interrupted, so its result is discarded.
+Async calls cancel the losing task outright. Attempts and retries stop as
+soon as the current request deadline (see `deadlines`) is exhausted.
+
+Configuration (environment variables, read by `from_env`):
+- `AGENT_LLM_HEDGE_PERCENTILE`: latency percentile that triggers a hedge
+  (default 95, `0` disables hedging)
+- `AGENT_LLM_HEDGE_MIN_DELAY`: lower bound on the hedge delay in seconds
+  (default 0.05)
+- `AGENT_LLM_HEDGE_RATIO`: hedge budget earned per call (default 0.1)
+- `AGENT_LLM_HEDGE_WORKERS`: threads running synchronous attempts (default 32)
+- `AGENT_LLM_MAX_ATTEMPTS`: attempts per call including retries (default 3)
+- `AGENT_LLM_RETRY_RATIO`: retry budget earned per call (default 0.2)
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+import httpx
+
+from deadlines import check_deadline, remaining_timeout
+
+# Exception class names raised by the openai SDK for retryable failures.
+_TRANSIENT_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+}
+
+_LOCK = threading.Lock()
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_WORKERS = 0
+# Attempts submitted to the pool and not yet finished (queued or running).
+_IN_FLIGHT = 0
+
+# Aggregate counters across all ResilientLLM instances.
+_STATS: Dict[str, int] = {
+    "calls": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+    "hedges_denied": 0,
+    "hedges_skipped_busy": 0,
+    "retries": 0,
+    "retries_denied": 0,
+    "failures": 0,
+}
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[key] += n
+
+
+def resilience_stats() -> Dict[str, int]:
+    """Return a snapshot of hedging and retry counters."""
+    with _LOCK:
+        return dict(_STATS)
+
+
+def reset_resilience_stats() -> None:
+    """Zero all hedging and retry counters (used by tests)."""
+    with _LOCK:
+        for key in _STATS:
+            _STATS[key] = 0
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    with _LOCK:
+        if _POOL is None:
+            _POOL_WORKERS = int(os.environ.get("AGENT_LLM_HEDGE_WORKERS", 32))
+            _POOL = ThreadPoolExecutor(
+                max_workers=_POOL_WORKERS, thread_name_prefix="llm-attempt"
+            )
+        return _POOL
+
+
+def _submit(fn: Callable[[], Any]) -> Future:
+    global _IN_FLIGHT
+    with _LOCK:
+        _IN_FLIGHT += 1
+    # each attempt runs in a copy of the caller's context so it sees the
+    # request deadline; a Context cannot be entered by two threads at once
+    future = _get_pool().submit(contextvars.copy_context().run, fn)
+    future.add_done_callback(_attempt_done)
+    return future
+
+
+def _attempt_done(_future: Future) -> None:
+    global _IN_FLIGHT
+    with _LOCK:
+        _IN_FLIGHT -= 1
+
+
+def _pool_has_idle_worker() -> bool:
+    with _LOCK:
+        return _IN_FLIGHT < _POOL_WORKERS
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Return True for errors worth retrying (timeouts, resets, 429/5xx)."""
+    if isinstance(exc, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return type(exc).__name__ in _TRANSIENT_NAMES
+
+
+class RetryBudget:
+    """Token bucket limiting extra attempts to a fraction of overall calls.
+
+    Every call deposits `ratio` tokens (up to `max_tokens`); every retry (or
+    hedge, for the hedge budget) withdraws one. `reserve` tokens are
+    available up front so low-traffic processes can still retry.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, reserve: float = 10.0, max_tokens: float = 100.0
+    ):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the `pct` percentile, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+
+class ResilientLLM:
+    """Wrap an LLM backend with hedged requests and budgeted retries."""
+
+    def __init__(
+        self,
+        backend: Any,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.05,
+        hedge_initial_delay: Optional[float] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        retry_budget: Optional[RetryBudget] = None,
+        hedge_budget: Optional[RetryBudget] = None,
+        latency: Optional[LatencyTracker] = None,
+        transient: Callable[[BaseException], bool] = is_transient,
+    ):
+        self.backend = backend
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget()
+        self.hedge_budget = hedge_budget or RetryBudget(ratio=0.1, reserve=5.0)
+        self.latency = latency or LatencyTracker()
+        self.transient = transient
+
+    @classmethod
+    def from_env(cls, backend: Any) -> "ResilientLLM":
+        """Build a wrapper configured from `AGENT_LLM_*` environment variables."""
+        return cls(
+            backend,
+            hedge_percentile=float(os.environ.get("AGENT_LLM_HEDGE_PERCENTILE", 95)),
+            hedge_min_delay=float(os.environ.get("AGENT_LLM_HEDGE_MIN_DELAY", 0.05)),
+            max_attempts=int(os.environ.get("AGENT_LLM_MAX_ATTEMPTS", 3)),
+            retry_budget=RetryBudget(
+                ratio=float(os.environ.get("AGENT_LLM_RETRY_RATIO", 0.2))
+            ),
+            hedge_budget=RetryBudget(
+                ratio=float(os.environ.get("AGENT_LLM_HEDGE_RATIO", 0.1)),
+                reserve=5.0,
+            ),
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return seconds to wait before hedging, or None to not hedge."""
+        if self.hedge_percentile <= 0:
+            return None
+        observed = self.latency.percentile(self.hedge_percentile)
+        if observed is None:
+            observed = self.hedge_initial_delay
+        if observed is None:
+            return None
+        return max(observed, self.hedge_min_delay)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _should_retry(self, exc: BaseException, attempt: int, pause: float) -> bool:
+        if attempt + 1 >= self.max_attempts or not self.transient(exc):
+            return False
+        remaining = remaining_timeout()
+        if remaining is not None and remaining <= pause:
+            return False
+        if not self.retry_budget.try_withdraw():
+            _count("retries_denied")
+            return False
+        _count("retries")
+        return True
+
+    def _may_hedge(self) -> bool:
+        if not self.hedge_budget.try_withdraw():
+            _count("hedges_denied")
+            return False
+        _count("hedges")
+        return True
+
+    def _timed(
+        self, fn: Callable[[], Any], started: Optional[threading.Event] = None
+    ) -> Callable[[], Any]:
+        def run():
+            if started is not None:
+                started.set()
+            check_deadline("llm_call")
+            start = time.monotonic()
+            result = fn()
+            self.latency.record(time.monotonic() - start)
+            return result
+
+        return run
+
+    def _hedged(self, fn: Callable[[], Any]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(fn)()
+        started = threading.Event()
+        primary = _submit(self._timed(fn, started))
+        # The hedge delay counts from when the primary starts running, not
+        # from submission: time spent queued for a worker is not LLM latency.
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        pending = {primary}
+        if not done:
+            if not _pool_has_idle_worker():
+                _count("hedges_skipped_busy")
+            elif self._may_hedge():
+                pending.add(_submit(self._timed(fn)))
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if fut is not primary:
+                        _count("hedge_wins")
+                    return fut.result()
+                error = fut.exception()
+        raise error  # type: ignore[misc]
+
+    def invoke(self, input: Any, config: Optional[Dict] = None, **kwargs) -> Any:
+        """Call the backend synchronously with hedging and retries."""
+        _count("calls")
+        self.retry_budget.deposit()
+        self.hedge_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return self._hedged(
+                    lambda: self.backend.invoke(input, config=config, **kwargs)
+                )
+            except Exception as exc:
+                pause = self._backoff(attempt)
+                if not self._should_retry(exc, attempt, pause):
+                    _count("failures")
+                    raise
+            time.sleep(pause)
+            attempt += 1
+
+    async def _ahedged(self, make: Callable[[], Any]) -> Any:
+        async def timed():
+            check_deadline("llm_call")
+            start = time.monotonic()
+            result = await make()
+            self.latency.record(time.monotonic() - start)
+            return result
+
+        delay = self.hedge_delay()
+        if delay is None:
+            return await timed()
+        primary = asyncio.ensure_future(timed())
+        pending = {primary}
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done and self._may_hedge():
+            pending.add(asyncio.ensure_future(timed()))
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            _count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, input: Any, config: Optional[Dict] = None, **kwargs) -> Any:
+        """Async variant of `invoke`; the losing hedge is cancelled."""
+        _count("calls")
+        self.retry_budget.deposit()
+        self.hedge_budget.deposit()
+        ainvoke = getattr(self.backend, "ainvoke", None)
+
+        def make():
+            if callable(ainvoke):
+                return ainvoke(input, config=config, **kwargs)
+            return asyncio.to_thread(
+                self.backend.invoke, input, config=config, **kwargs
+            )
+
+        attempt = 0
+        while True:
+            try:
+                return await self._ahedged(make)
+            except Exception as exc:
+                pause = self._backoff(attempt)
+                if not self._should_retry(exc, attempt, pause):
+                    _count("failures")
+                    raise
+            await asyncio.sleep(pause)
+            attempt += 1
+
+
+def wrap_llm(llm: Any, wrapper: Optional[ResilientLLM] = None) -> Any:
+    """Return a LangChain runnable that routes `llm` calls through ResilientLLM.
+
+    The result composes with `|` like the original model so it can replace
+    it in the agent pipeline.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    resilient = wrapper or ResilientLLM.from_env(llm)
+    return RunnableLambda(resilient.invoke, afunc=resilient.ainvoke, name="llm")
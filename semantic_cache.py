@@ -0,0 +1,278 @@
+"""Semantic response cache backed by a vectorized nearest-neighbour index.
+
+Exact-match caching misses paraphrased questions. `SemanticCache` embeds
+the request input, searches a contiguous NumPy matrix of previously seen
+inputs with a single matrix-vector product (cosine similarity on unit
+vectors) and returns the cached response when the best match clears the
+similarity threshold.
+
+- Embedders are pluggable: any object with `embed(texts) -> ndarray`
+  returning one row per text. `OpenAIEmbedder` (the default) uses the
+  provider's embeddings endpoint. `HashingEmbedder` is local and offline
+  but purely lexical: it scores "is it safe" and "is it not safe" as near
+  duplicates and misses reworded paraphrases, so use it for tests and
+  offline development only.
+- When full, the least recently used entry is evicted.
+- With a `path`, the index is snapshotted to `vectors-<generation>.npy`
+  plus `entries.json` (committed atomically by `flush`) and memory-mapped
+  copy-on-write on start-up, so it survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Offline embedder using hashed word and character-trigram features.
+
+    Deterministic across processes (uses blake2b rather than `hash()`), so
+    persisted indexes stay valid after a restart. It only measures shared
+    words, not meaning; do not serve production traffic with it.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        feats = [f"w:{w}" for w in words]
+        for w in words:
+            padded = f"#{w}#"
+            feats.extend(f"c:{padded[i : i + 3]}" for i in range(len(padded) - 2))
+        return feats
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                digest = hashlib.blake2b(feat.encode(), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                sign = 1.0 if (h >> 63) & 1 else -1.0
+                out[row, h % self.dim] += sign
+        return out
+
+
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings API via LangChain.
+
+    Shares the pooled HTTP clients from `llm_http`.
+    """
+
+    def __init__(self, model: str = "text-embedding-3-small"):
+        from langchain_openai import OpenAIEmbeddings  # type: ignore
+
+        from llm_http import get_async_http_client, get_http_client
+
+        self._client = OpenAIEmbeddings(
+            model=model,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._client.embed_documents(texts), dtype=np.float32)
+
+
+def make_embedder(name: str = "openai") -> Any:
+    """Return an embedder by name (`openai` or, for tests/offline, `hashing`)."""
+    if name == "openai":
+        return OpenAIEmbedder()
+    if name == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embedder: {name!r}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+@dataclass
+class CacheLookup:
+    """Result of a cache lookup; `value` is None on a miss."""
+
+    value: Any
+    similarity: float
+    lookup_ms: float
+    vector: np.ndarray
+
+    @property
+    def hit(self) -> bool:
+        return self.value is not None
+
+    def metadata(self) -> dict:
+        return {
+            "hit": self.hit,
+            "similarity": round(self.similarity, 4),
+            "lookup_ms": round(self.lookup_ms, 3),
+        }
+
+
+class SemanticCache:
+    """Threshold-based semantic cache over a fixed-capacity vector index."""
+
+    def __init__(
+        self,
+        embedder: Any,
+        threshold: float = 0.92,
+        capacity: int = 4096,
+        path: Optional[str] = None,
+        flush_every: int = 16,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._generation = 0
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._entries: List[Any] = [None] * capacity
+        self._count = 0
+        self._dirty = 0
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entries_file(self) -> str:
+        return os.path.join(self.path, "entries.json")
+
+    def _allocate(self, dim: int) -> None:
+        self._dim = dim
+        self._vectors = np.zeros((self.capacity, dim), dtype=np.float32)
+
+    def _load(self) -> None:
+        try:
+            with open(self._entries_file(), encoding="utf-8") as fh:
+                meta = json.load(fh)
+            # Copy-on-write mapping: stores never modify the committed snapshot.
+            vectors = np.load(os.path.join(self.path, meta["vectors"]), mmap_mode="c")
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != self.capacity:
+            return
+        count = min(int(meta.get("count", 0)), self.capacity)
+        self._generation = int(meta.get("generation", 0))
+        self._dim = vectors.shape[1]
+        self._vectors = vectors
+        self._count = count
+        for i, entry in enumerate(meta.get("entries", [])[:count]):
+            self._entries[i] = entry
+        last_used = meta.get("last_used", [])[:count]
+        self._last_used[: len(last_used)] = last_used
+
+    def flush(self) -> None:
+        """Persist pending changes when a `path` is configured.
+
+        Vectors go to a new `vectors-<generation>.npy`; `entries.json`, which
+        names that file, is then replaced atomically. A crash at any point
+        leaves the previous snapshot intact, so a vector is never paired
+        with another question's answer.
+        """
+        if not self.path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if self._vectors is None or self._dirty == 0:
+                    return
+                vectors = np.array(self._vectors)
+                meta = {
+                    "count": self._count,
+                    "entries": self._entries[: self._count],
+                    "last_used": self._last_used[: self._count].tolist(),
+                }
+                self._dirty = 0
+            self._generation += 1
+            name = f"vectors-{self._generation}.npy"
+            meta.update(generation=self._generation, vectors=name)
+            os.makedirs(self.path, exist_ok=True)
+            target = os.path.join(self.path, name)
+            with open(target + ".tmp", "wb") as fh:
+                np.save(fh, vectors)
+            os.replace(target + ".tmp", target)
+            tmp = self._entries_file() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(meta, fh)
+            os.replace(tmp, self._entries_file())
+            for old in os.listdir(self.path):
+                if old.startswith("vectors-") and old != name:
+                    try:
+                        os.remove(os.path.join(self.path, old))
+                    except OSError:
+                        pass
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return _normalize(np.atleast_2d(self.embedder.embed(texts)))
+
+    def _search(self, queries: np.ndarray) -> tuple:
+        # Caller holds the lock.
+        if self._count == 0 or self._vectors is None or queries.shape[1] != self._dim:
+            n = queries.shape[0]
+            return np.full(n, -1), np.zeros(n, dtype=np.float32)
+        scores = queries @ self._vectors[: self._count].T
+        best = np.argmax(scores, axis=1)
+        return best, scores[np.arange(len(best)), best]
+
+    def search(self, queries: np.ndarray) -> tuple:
+        """Batched nearest-neighbour search for unit-norm `queries`.
+
+        Returns `(indices, scores)` arrays with one entry per query; index
+        is -1 when the cache is empty. Indices are only stable until the
+        next `store`.
+        """
+        with self._lock:
+            return self._search(np.atleast_2d(queries))
+
+    def lookup(self, text: str) -> CacheLookup:
+        """Return the cached value for the nearest input above the threshold."""
+        start = time.perf_counter()
+        vector = self.embed([text])[0]
+        value = None
+        # Search and read the entry under one lock so a concurrent `store`
+        # cannot evict the matched slot in between.
+        with self._lock:
+            idx, score = self._search(np.atleast_2d(vector))
+            idx, similarity = int(idx[0]), float(score[0])
+            if idx >= 0 and similarity >= self.threshold:
+                value = self._entries[idx]
+                self._last_used[idx] = time.time()
+        lookup_ms = (time.perf_counter() - start) * 1000
+        return CacheLookup(value, similarity, lookup_ms, vector)
+
+    def store(self, text: str, value: Any, vector: Optional[np.ndarray] = None):
+        """Insert `value` for `text`, evicting the least recently used entry."""
+        if vector is None:
+            vector = self.embed([text])[0]
+        with self._lock:
+            if self._vectors is None or self._dim != vector.shape[0]:
+                # first insert, or the embedder changed: start a fresh index
+                self._allocate(vector.shape[0])
+                self._count = 0
+            if self._count < self.capacity:
+                slot = self._count
+                self._count += 1
+            else:
+                slot = int(np.argmin(self._last_used[: self._count]))
+            self._vectors[slot] = vector
+            self._entries[slot] = value
+            self._last_used[slot] = time.time()
+            self._dirty += 1
+            due = self.path and self._dirty >= self.flush_every
+        if due:
+            self.flush()
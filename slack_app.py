@@ -0,0 +1,328 @@
+"""Slack front end for the agent built on the shared executor.
+
+Slack requires event acknowledgements within 3 seconds and traffic arrives
+in bursts, so events are never processed inline:
+
+- the Bolt listener only dedupes and enqueues the event, then returns so
+  Bolt can ack immediately;
+- a bounded pool of async workers calls the same executor as
+  `api.get_executor` (in threads, like the HTTP endpoints);
+- partial answers from stream-capable executors are batched into at most
+  one `chat.update` per `update_interval` seconds per message;
+- all `chat.update` calls of the dispatcher share one limiter, kept under
+  Slack's per-workspace rate limit for the method (Tier 3, about 50 per
+  minute). Intermediate edits are skipped when no slot is free, final
+  answers wait for one, and `ratelimited` responses pause every update
+  for the `Retry-After` period;
+- Slack retries (same `event_id`) of queued events are dropped; an event
+  dropped because the queue was full is accepted again when Slack retries.
+
+`SlackDispatcher` does not depend on Bolt and works with any client that
+exposes async `chat_postMessage` / `chat_update`, which keeps it testable
+against a fake event source. `create_app` wires it into a Bolt `AsyncApp`.
+
+Configuration (environment variables, read by `mount_slack`):
+- `SLACK_BOT_TOKEN`, `SLACK_SIGNING_SECRET`: Slack app credentials
+- `SLACK_WORKERS`: concurrent agent runs (default 8)
+- `SLACK_MAX_QUEUE`: pending events before new ones are dropped (default 200)
+- `SLACK_UPDATE_INTERVAL`: seconds between streamed message edits (default 1.0)
+- `SLACK_UPDATES_PER_MINUTE`: `chat.update` calls across all messages
+  (default 50)
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+_MENTION_RE = re.compile(r"<@[A-Z0-9]+>\s*")
+_STREAM_DONE = object()
+PLACEHOLDER_TEXT = "_Thinking..._"
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Return the Retry-After delay of a rate-limited Web API error, else None."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    error = response.get("error") if hasattr(response, "get") else None
+    if getattr(response, "status_code", None) != 429 and error != "ratelimited":
+        return None
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class _RateLimiter:
+    """Spaces calls `60 / per_minute` seconds apart on one event loop."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._blocked_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Block all calls for `seconds` (a Retry-After from Slack)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        if now < self._blocked_until or now < self._next:
+            return False
+        self._next = now + self.interval
+        return True
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            if time.monotonic() >= self._blocked_until:
+                return
+
+
+class SlackDispatcher:
+    """Queue Slack events and answer them on a bounded worker pool."""
+
+    def __init__(
+        self,
+        executor_provider: Callable[[], Any],
+        client: Any = None,
+        workers: int = 8,
+        max_queue: int = 200,
+        update_interval: float = 1.0,
+        dedupe_size: int = 10000,
+        updates_per_minute: float = 50.0,
+        max_update_attempts: int = 3,
+    ):
+        self.executor_provider = executor_provider
+        self.client = client
+        self.workers = workers
+        self.update_interval = update_interval
+        self.dedupe_size = dedupe_size
+        self.max_update_attempts = max(1, max_update_attempts)
+        self._update_limiter = _RateLimiter(updates_per_minute)
+        self._max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "received": 0,
+            "duplicates": 0,
+            "dropped": 0,
+            "processed": 0,
+            "failed": 0,
+            "updates": 0,
+            "updates_skipped": 0,
+            "update_errors": 0,
+            "rate_limited": 0,
+        }
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        # Created lazily so the queue and tasks bind to the serving loop.
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+        return self._queue
+
+    def _is_duplicate(self, event_id: Optional[str]) -> bool:
+        if not event_id or event_id not in self._seen:
+            return False
+        self._seen.move_to_end(event_id)
+        return True
+
+    def _remember(self, event_id: Optional[str]) -> None:
+        if not event_id:
+            return
+        self._seen[event_id] = None
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+
+    def handle_event(self, event: Dict[str, Any], event_id: Optional[str] = None):
+        """Accept an event without blocking; return True if it was queued.
+
+        Must be called from the event loop. Bot messages, Slack retries of an
+        already seen `event_id` and events arriving while the queue is full
+        are dropped.
+        """
+        self.stats["received"] += 1
+        if event.get("bot_id") or event.get("subtype"):
+            return False
+        if self._is_duplicate(event_id):
+            self.stats["duplicates"] += 1
+            return False
+        queue = self._ensure_workers()
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # not remembered, so Slack's retry of this event gets a chance
+            self.stats["dropped"] += 1
+            return False
+        self._remember(event_id)
+        return True
+
+    async def join(self) -> None:
+        """Wait until every queued event has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """Stop the workers; queued events are discarded."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._answer(event)
+                self.stats["processed"] += 1
+            except Exception:
+                self.stats["failed"] += 1
+            finally:
+                self._queue.task_done()
+
+    async def _update(
+        self, channel: str, ts: str, text: str, final: bool = False
+    ) -> bool:
+        """Edit a message within the shared rate limit.
+
+        Intermediate edits are skipped when no slot is free (the next batch
+        carries the full text); final edits wait and are retried after a
+        `ratelimited` response.
+        """
+        for _ in range(self.max_update_attempts if final else 1):
+            if final:
+                await self._update_limiter.acquire()
+            elif not self._update_limiter.try_acquire():
+                self.stats["updates_skipped"] += 1
+                return False
+            try:
+                await self.client.chat_update(channel=channel, ts=ts, text=text)
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is None:
+                    break
+                self.stats["rate_limited"] += 1
+                self._update_limiter.pause(retry_after)
+                continue
+            self.stats["updates"] += 1
+            return True
+        self.stats["update_errors"] += 1
+        return False
+
+    async def _answer(self, event: Dict[str, Any]) -> None:
+        channel = event["channel"]
+        thread_ts = event.get("thread_ts") or event.get("ts")
+        text = _MENTION_RE.sub("", event.get("text") or "").strip()
+        payload = {"input": text, "chat_history": []}
+
+        placeholder = await self.client.chat_postMessage(
+            channel=channel, thread_ts=thread_ts, text=PLACEHOLDER_TEXT
+        )
+        ts = placeholder["ts"]
+
+        try:
+            executor = self.executor_provider()
+            stream_fn = getattr(executor, "stream_invoke", None)
+            if callable(stream_fn):
+                answer = await self._stream(stream_fn, payload, channel, ts)
+            else:
+                out = await asyncio.to_thread(executor.invoke, payload)
+                answer = out.get("output") or ""
+        except Exception as e:
+            await self._update(
+                channel, ts, f"Sorry, something went wrong: {e}", final=True
+            )
+            raise
+        await self._update(channel, ts, answer or "(no answer)", final=True)
+
+    async def _stream(self, stream_fn, payload, channel: str, ts: str) -> str:
+        pieces = await asyncio.to_thread(lambda: iter(stream_fn(payload)))
+        parts: List[str] = []
+        last_update = time.monotonic()
+        sent = 0
+        while True:
+            piece = await asyncio.to_thread(next, pieces, _STREAM_DONE)
+            if piece is _STREAM_DONE:
+                break
+            parts.append(str(piece))
+            now = time.monotonic()
+            if now - last_update >= self.update_interval and len(parts) > sent:
+                sent = len(parts)
+                last_update = now
+                await self._update(channel, ts, "".join(parts))
+        return "".join(parts)
+
+
+def create_app(dispatcher: SlackDispatcher, **app_kwargs) -> Any:
+    """Return a Bolt `AsyncApp` that feeds mentions and DMs to `dispatcher`.
+
+    `app_kwargs` are passed to `AsyncApp` (token, signing_secret, ...). The
+    dispatcher uses the app's web client unless it already has one.
+    """
+    from slack_bolt.async_app import AsyncApp
+
+    app = AsyncApp(**app_kwargs)
+    if dispatcher.client is None:
+        dispatcher.client = app.client
+
+    async def on_mention(body, event):
+        dispatcher.handle_event(event, body.get("event_id"))
+
+    async def on_message(body, event):
+        # Channel messages that mention the bot also arrive as app_mention;
+        # only direct messages are answered here to avoid double replies.
+        if event.get("channel_type") == "im":
+            dispatcher.handle_event(event, body.get("event_id"))
+
+    app.event("app_mention")(on_mention)
+    app.event("message")(on_message)
+    return app
+
+
+def mount_slack(fastapi_app: Any, executor_provider: Callable[[], Any]) -> Any:
+    """Serve Slack events at `/slack/events` on `fastapi_app`.
+
+    Credentials and pool sizes come from the environment (see module docs).
+    Returns the dispatcher so callers can inspect its stats.
+    """
+    from fastapi import Request
+    from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
+
+    dispatcher = SlackDispatcher(
+        executor_provider,
+        workers=int(os.environ.get("SLACK_WORKERS", 8)),
+        max_queue=int(os.environ.get("SLACK_MAX_QUEUE", 200)),
+        update_interval=float(os.environ.get("SLACK_UPDATE_INTERVAL", 1.0)),
+        updates_per_minute=float(os.environ.get("SLACK_UPDATES_PER_MINUTE", 50)),
+    )
+    bolt_app = create_app(
+        dispatcher,
+        token=os.environ["SLACK_BOT_TOKEN"],
+        signing_secret=os.environ["SLACK_SIGNING_SECRET"],
+    )
+    handler = AsyncSlackRequestHandler(bolt_app)
+
+    async def slack_events(request: Request):
+        return await handler.handle(request)
+
+    fastapi_app.add_api_route(
+        "/slack/events", slack_events, methods=["POST"], include_in_schema=False
+    )
+    return dispatcher
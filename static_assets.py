@@ -0,0 +1,272 @@
+"""Cache-friendly static file serving for the bundled web UI.
+
+`PrecompressedStaticFiles` is a drop-in `StaticFiles` replacement that:
+
+- serves `.br` / `.gz` siblings generated at build time (see
+  `precompress_directory` and `tools/precompress.py`) when the client
+  accepts them, so no compression happens per request;
+- marks content-hashed Vite assets (`assets/name-<hash>.ext`) as
+  `immutable` for a year and makes everything else (e.g. `index.html`)
+  revalidate on every use;
+- emits a per-encoding ETag and answers `If-None-Match` with 304;
+- keeps small hot files in a bounded in-memory LRU so they are not read
+  from disk on every request; cache misses are read in a worker thread so
+  disk I/O never blocks the event loop.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:  # brotli is optional; without it only gzip variants are produced/served
+    import brotli  # type: ignore
+except Exception:  # pragma: no cover - depends on environment
+    brotli = None
+
+# Vite names bundled assets `<name>-<8+ char hash>.<ext>`.
+_HASHED_RE = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+# File types worth compressing; images/fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = (
+    ".html",
+    ".js",
+    ".mjs",
+    ".css",
+    ".json",
+    ".map",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".wasm",
+    ".webmanifest",
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Encodings in order of preference with the suffix of their sibling file.
+_ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            accepted.append(name.strip().lower())
+    return accepted
+
+
+class _CacheableFileResponse(FileResponse):
+    """FileResponse for a file small enough for the memory cache.
+
+    `PrecompressedStaticFiles.get_response` replaces it with an in-memory
+    response after reading the file off the event loop; used as is it
+    simply streams from disk.
+    """
+
+    def __init__(self, path: str, headers: Dict[str, str], **kwargs):
+        super().__init__(path, headers=headers, **kwargs)
+        self.cache_headers = dict(headers)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles with precompressed variants, cache headers and a memory cache."""
+
+    def __init__(
+        self,
+        *args,
+        immutable_dir: str = "assets",
+        memory_cache_max_file: int = 64 * 1024,
+        memory_cache_max_bytes: int = 16 * 1024 * 1024,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.immutable_dir = immutable_dir
+        self.memory_cache_max_file = memory_cache_max_file
+        self.memory_cache_max_bytes = memory_cache_max_bytes
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._cached_bytes = 0
+        self._variants: Dict[tuple, Dict[str, Tuple[str, os.stat_result]]] = {}
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_reads": 0}
+
+    def _find_variants(
+        self, full_path: str, stat_result: os.stat_result
+    ) -> Dict[str, Tuple[str, os.stat_result]]:
+        key = (full_path, stat_result.st_mtime_ns, stat_result.st_size)
+        variants = self._variants.get(key)
+        if variants is None:
+            variants = {}
+            for encoding, suffix in _ENCODINGS:
+                try:
+                    st = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                # Ignore stale siblings left over from a previous build.
+                if st.st_mtime_ns >= stat_result.st_mtime_ns:
+                    variants[encoding] = (full_path + suffix, st)
+            self._variants[key] = variants
+        return variants
+
+    def _cache_control(self, full_path: str) -> str:
+        rel = os.path.relpath(full_path, self.directory) if self.directory else ""
+        rel = rel.replace(os.sep, "/")
+        if rel.startswith(self.immutable_dir + "/") and _HASHED_RE.search(rel):
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def _cached_body(self, path: str, st: os.stat_result) -> Optional[bytes]:
+        """Return file bytes from the memory cache, or None on a miss."""
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return body
+
+    def _load_body(self, path: str, st: os.stat_result) -> bytes:
+        """Read a small file into the memory cache (blocking; run in a thread)."""
+        key = (path, st.st_mtime_ns, st.st_size)
+        with open(path, "rb") as fh:
+            body = fh.read()
+        with self._lock:
+            self.stats["disk_reads"] += 1
+            if key in self._bodies:  # loaded concurrently by another request
+                return body
+            self._bodies[key] = body
+            self._cached_bytes += len(body)
+            while self._cached_bytes > self.memory_cache_max_bytes and self._bodies:
+                _, evicted = self._bodies.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return body
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        path, st, encoding = full_path, stat_result, None
+        variants = self._find_variants(full_path, stat_result)
+        if variants:
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for name, _ in _ENCODINGS:
+                if name in variants and name in accepted:
+                    encoding = name
+                    path, st = variants[name]
+                    break
+
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}'
+        etag += f'-{encoding}"' if encoding else '"'
+        headers = {
+            "cache-control": self._cache_control(full_path),
+            "etag": etag,
+        }
+        if variants:
+            headers["vary"] = "Accept-Encoding"
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        if status_code == 200 and self.is_not_modified(
+            Headers(headers=headers), request_headers
+        ):
+            return NotModifiedResponse(Headers(headers=headers))
+
+        if st.st_size > self.memory_cache_max_file:
+            self.stats["disk_reads"] += 1
+            return FileResponse(
+                path,
+                status_code=status_code,
+                headers=headers,
+                media_type=media_type,
+                stat_result=st,
+            )
+        body = self._cached_body(path, st)
+        if body is None:
+            return _CacheableFileResponse(
+                path,
+                headers,
+                status_code=status_code,
+                media_type=media_type,
+                stat_result=st,
+            )
+        return self._memory_response(body, status_code, headers, media_type, scope)
+
+    @staticmethod
+    def _memory_response(
+        body: bytes,
+        status_code: int,
+        headers: Dict[str, str],
+        media_type: str,
+        scope: Scope,
+    ) -> Response:
+        headers = dict(headers)
+        if scope["method"] == "HEAD":
+            headers["content-length"] = str(len(body))
+            body = b""
+        return Response(body, status_code, headers=headers, media_type=media_type)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if isinstance(response, _CacheableFileResponse):
+            body = await anyio.to_thread.run_sync(
+                self._load_body, str(response.path), response.stat_result
+            )
+            response = self._memory_response(
+                body,
+                response.status_code,
+                response.cache_headers,
+                response.media_type,
+                scope,
+            )
+        return response
+
+
+def precompress_directory(
+    directory: str, min_size: int = 256, level: int = 9
+) -> Dict[str, int]:
+    """Write `.gz` (and `.br` when brotli is installed) siblings for assets.
+
+    Only compressible types of at least `min_size` bytes are processed, and
+    a variant is kept only if it is smaller than the original. Returns
+    counts of files written per encoding.
+    """
+    written = {"gzip": 0, "br": 0}
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as fh:
+                data = fh.read()
+            if len(data) < min_size:
+                continue
+            outputs = [("gzip", ".gz", gzip.compress(data, level, mtime=0))]
+            if brotli is not None:
+                outputs.append(("br", ".br", brotli.compress(data, quality=11)))
+            for encoding, suffix, compressed in outputs:
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + suffix, "wb") as fh:
+                    fh.write(compressed)
+                written[encoding] += 1
+    return written
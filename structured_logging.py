@@ -0,0 +1,318 @@
+"""Non-blocking structured logging and sampled agent traces.
+
+`build_agent` used to run executors with `verbose=True`, printing every agent
+step synchronously to stdout from worker threads. This module provides the
+replacement pipeline:
+
+- loggers under `agent.*` hand records to a bounded in-memory queue; a
+  background `QueueListener` thread formats them as JSON lines and writes
+  them to the sink, so a slow sink never blocks request threads (records
+  are dropped and counted when the queue is full);
+- every record carries the request's correlation id (`X-Request-ID`);
+- LangChain callback events are routed to the `agent.trace` logger by
+  `make_trace_handler`, for a sampled fraction of requests.
+
+Configuration (environment variables):
+- `AGENT_LOG_LEVEL`: level for `agent.*` loggers (default INFO)
+- `AGENT_LOG_QUEUE_SIZE`: records buffered before dropping (default 10000)
+- `AGENT_TRACE_SAMPLE_RATE`: fraction of requests whose agent steps are
+  traced (default 0.01)
+- `AGENT_TRACE_TO_STDOUT`: set to `1` to restore LangChain's verbose stdout
+  output instead of routing traces into this pipeline
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "agent_request_id", default=None
+)
+_trace_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "agent_trace_sampled", default=False
+)
+
+_LOCK = threading.Lock()
+_listener: Optional["_QueueListener"] = None
+_handler: Optional["DroppingQueueHandler"] = None
+
+# Attributes every LogRecord has; anything else was passed via `extra=`.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+logger = logging.getLogger("agent")
+trace_logger = logging.getLogger("agent.trace")
+
+
+def get_request_id() -> Optional[str]:
+    """Return the correlation id of the request being handled, if any."""
+    return _request_id.get()
+
+
+def set_request_context(request_id: Optional[str], sampled: bool = False):
+    """Attach a correlation id and trace sampling decision to this context.
+
+    Returns tokens for `reset_request_context`.
+    """
+    return _request_id.set(request_id), _trace_sampled.set(sampled)
+
+
+def reset_request_context(tokens) -> None:
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _trace_sampled.reset(sampled_token)
+
+
+def trace_sample_rate() -> float:
+    try:
+        return float(os.environ.get("AGENT_TRACE_SAMPLE_RATE", 0.01))
+    except ValueError:
+        return 0.0
+
+
+def should_sample() -> bool:
+    """Decide whether the current request's agent steps are traced."""
+    rate = trace_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def trace_sampled() -> bool:
+    return _trace_sampled.get()
+
+
+def traces_to_stdout() -> bool:
+    """True when LangChain's own verbose stdout tracing is requested."""
+    return os.environ.get("AGENT_TRACE_TO_STDOUT", "0").lower() in ("1", "true", "yes")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: records are dropped when full.
+
+    The correlation id is captured here, in the emitting thread, because the
+    listener thread does not share the request's context.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.stats: Dict[str, int] = {"enqueued": 0, "dropped": 0}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.stats["enqueued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: a full queue must not make shutdown fail.
+        self.queue.put(self._sentinel)
+
+
+def configure_logging(stream: Any = None, level: Optional[str] = None) -> None:
+    """Install the queue-based pipeline on the `agent` logger (idempotent).
+
+    Records are written as JSON lines to `stream` (default stderr) by a
+    background thread. Call `shutdown_logging` to flush and stop it.
+    """
+    global _listener, _handler
+    with _LOCK:
+        if _listener is not None:
+            return
+        q: queue.Queue = queue.Queue(int(os.environ.get("AGENT_LOG_QUEUE_SIZE", 10000)))
+        sink = logging.StreamHandler(stream or sys.stderr)
+        sink.setFormatter(JsonFormatter())
+        _handler = DroppingQueueHandler(q)
+        _listener = _QueueListener(q, sink, respect_handler_level=True)
+        logger.addHandler(_handler)
+        logger.setLevel(level or os.environ.get("AGENT_LOG_LEVEL", "INFO"))
+        logger.propagate = False
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush pending records and remove the pipeline from the `agent` logger."""
+    global _listener, _handler
+    with _LOCK:
+        listener, handler = _listener, _handler
+        _listener = _handler = None
+    if listener is not None:
+        listener.stop()
+    if handler is not None:
+        logger.removeHandler(handler)
+
+
+def logging_stats() -> Dict[str, int]:
+    """Return queue counters for the pipeline (zeros when not configured)."""
+    handler = _handler
+    if handler is None:
+        return {"enqueued": 0, "dropped": 0, "queue_depth": 0}
+    return {**handler.stats, "queue_depth": handler.queue.qsize()}
+
+
+def trace_event(event: str, **fields: Any) -> None:
+    """Log an agent trace event if the current request is sampled."""
+    if _trace_sampled.get() and trace_logger.isEnabledFor(logging.INFO):
+        trace_logger.info(event, extra={"event": event, **fields})
+
+
+def _preview(value: Any, limit: int = 500) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def make_trace_handler() -> Any:
+    """Return a LangChain callback handler that routes events to `agent.trace`.
+
+    Replaces `verbose=True` stdout printing; only sampled requests are
+    traced. Every callback returns before building any payload for
+    unsampled requests, and formatting/writing happens on the logging
+    thread.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class AgentTraceCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._starts: Dict[Any, float] = {}
+
+        def _start(self, run_id) -> None:
+            self._starts[run_id] = time.perf_counter()
+
+        def _elapsed_ms(self, run_id) -> Optional[float]:
+            start = self._starts.pop(run_id, None)
+            if start is None:
+                return None
+            return round((time.perf_counter() - start) * 1000, 3)
+
+        def on_chain_start(self, serialized, inputs, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._start(run_id)
+            trace_event("chain_start", run_id=run_id, inputs=_preview(inputs))
+
+        def on_chain_end(self, outputs, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            trace_event(
+                "chain_end",
+                run_id=run_id,
+                outputs=_preview(outputs),
+                duration_ms=self._elapsed_ms(run_id),
+            )
+
+        def on_chat_model_start(self, serialized, messages, *, run_id=None, **kw):
+            if not _trace_sampled.get():
+                return
+            self._start(run_id)
+            trace_event("llm_start", run_id=run_id, messages=_preview(messages))
+
+        def on_llm_start(self, serialized, prompts, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._start(run_id)
+            trace_event("llm_start", run_id=run_id, prompts=_preview(prompts))
+
+        def on_llm_end(self, response, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            trace_event(
+                "llm_end",
+                run_id=run_id,
+                response=_preview(response),
+                duration_ms=self._elapsed_ms(run_id),
+            )
+
+        def on_tool_start(self, serialized, input_str, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._start(run_id)
+            name = (serialized or {}).get("name")
+            trace_event("tool_start", run_id=run_id, tool=name, input=input_str)
+
+        def on_tool_end(self, output, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            trace_event(
+                "tool_end",
+                run_id=run_id,
+                output=_preview(output),
+                duration_ms=self._elapsed_ms(run_id),
+            )
+
+        def _error(self, kind: str, error, run_id) -> None:
+            trace_event(
+                f"{kind}_error",
+                run_id=run_id,
+                error=_preview(error),
+                duration_ms=self._elapsed_ms(run_id),
+            )
+
+        def on_chain_error(self, error, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._error("chain", error, run_id)
+
+        def on_llm_error(self, error, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._error("llm", error, run_id)
+
+        def on_tool_error(self, error, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            self._error("tool", error, run_id)
+
+        def on_agent_action(self, action, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            trace_event(
+                "agent_action",
+                run_id=run_id,
+                tool=getattr(action, "tool", None),
+                tool_input=_preview(getattr(action, "tool_input", None)),
+            )
+
+        def on_agent_finish(self, finish, *, run_id=None, **kwargs):
+            if not _trace_sampled.get():
+                return
+            trace_event(
+                "agent_finish",
+                run_id=run_id,
+                output=_preview(getattr(finish, "return_values", None)),
+            )
+
+    return AgentTraceCallbackHandler()
@@ -0,0 +1,47 @@
+import pytest
+
+import agent
+
+
+@pytest.fixture
+def scripted_agent(monkeypatch):
+    """Build real AgentExecutors via `build_agent` around a scripted model.
+
+    The model first calls the `echo` tool, then answers "done". Skips when
+    no LangChain AgentExecutor is installed.
+    """
+    from langchain_core.language_models.fake_chat_models import (
+        FakeMessagesListChatModel,
+    )
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import tool
+
+    try:
+        components = agent._import_langchain_components()
+    except ImportError as exc:
+        pytest.skip(f"LangChain agent runtime unavailable: {exc}")
+    monkeypatch.setattr(agent, "_import_langchain_components", lambda: components)
+
+    @tool
+    def echo(text: str) -> str:
+        """Echo the text back."""
+        return text
+
+    def make(**kwargs):
+        llm = FakeMessagesListChatModel(
+            responses=[
+                AIMessage(
+                    content="",
+                    additional_kwargs={
+                        "function_call": {
+                            "name": "echo",
+                            "arguments": '{"text": "hi"}',
+                        }
+                    },
+                ),
+                AIMessage(content="done"),
+            ]
+        )
+        return agent.build_agent(llm=llm, tools=[echo], **kwargs)
+
+    return make
@@ -1,8 +1,12 @@
+import pytest
+
+import agent
 from agent import build_agent
 
 
-def test_build_agent_fallback_invokes_tool():
-    # In environments without LangChain, build_agent returns a fallback executor
+def test_build_agent_fallback_invokes_tool(monkeypatch):
+    # Without LangChain (or an API key), build_agent returns a fallback executor
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
     executor = build_agent()
     result = executor.invoke({"input": "abc", "chat_history": []})
     # Fallback executor includes example_tool by default and will call it
@@ -15,3 +19,14 @@ def test_echo_tool_importable():
     from tools.echo_tool import echo_tool
 
     assert echo_tool("x") == "echo: x"
+
+
+def test_build_agent_uses_installed_agent_runtime(monkeypatch):
+    # langchain 1.x only ships AgentExecutor through langchain-classic
+    try:
+        agent._import_langchain_components()
+    except ImportError as exc:
+        pytest.skip(f"LangChain agent runtime unavailable: {exc}")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    executor = build_agent()
+    assert not isinstance(executor, agent._FallbackExecutor)
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import deadlines
+import llm_http
+from agent import _FallbackExecutor
+from deadlines import (
+    Deadline,
+    DeadlineExceeded,
+    RequestCancelled,
+    check_deadline,
+    deadline_scope,
+    run_in_scope,
+)
+
+
+class CooperativeExecutor:
+    """Executor doing 50 short iterations, checkpointing before each one."""
+
+    def __init__(self, steps=50, step_time=0.02):
+        self.steps = steps
+        self.step_time = step_time
+        self.completed = 0
+        self.stopped = threading.Event()
+
+    def invoke(self, payload):
+        try:
+            for _ in range(self.steps):
+                check_deadline("iteration")
+                time.sleep(self.step_time)
+                self.completed += 1
+            return {"output": "done"}
+        finally:
+            self.stopped.set()
+
+    def stream_invoke(self, payload):
+        try:
+            for i in range(self.steps):
+                check_deadline("iteration")
+                time.sleep(self.step_time)
+                self.completed += 1
+                yield f"piece-{i} "
+        finally:
+            self.stopped.set()
+
+
+class DisconnectedRequest:
+    async def is_disconnected(self):
+        return True
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    deadlines.reset_cancellation_stats()
+    yield
+
+
+def test_deadline_check_raises_after_expiry():
+    d = Deadline(0.01)
+    d.check()
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        d.check("llm_call")
+    stats = deadlines.cancellation_stats()
+    assert stats["deadline_exceeded"] == 1 and stats["llm_calls_skipped"] == 1
+
+
+def test_invoke_deadline_cancels_executor(monkeypatch):
+    executor = CooperativeExecutor()
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    client = TestClient(api.app)
+
+    start = time.monotonic()
+    r = client.post("/v1/invoke", json={"input": "hi", "timeout_ms": 100})
+    assert r.status_code == 504
+    assert time.monotonic() - start < 0.5
+
+    assert executor.stopped.wait(1)
+    assert executor.completed < executor.steps
+    assert deadlines.cancellation_stats()["iterations_skipped"] == 1
+
+
+def test_invoke_honours_timeout_header(monkeypatch):
+    executor = CooperativeExecutor()
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    client = TestClient(api.app)
+
+    r = client.post(
+        "/v1/invoke", json={"input": "hi"}, headers={"X-Request-Timeout-Ms": "50"}
+    )
+    assert r.status_code == 504
+
+
+def test_invoke_without_deadline_completes(monkeypatch):
+    executor = CooperativeExecutor(steps=3, step_time=0.0)
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    client = TestClient(api.app)
+
+    r = client.post("/v1/invoke", json={"input": "hi"})
+    assert r.status_code == 200 and r.json()["output"] == "done"
+
+
+def test_disconnect_cancels_executor():
+    executor = CooperativeExecutor()
+    deadline = Deadline()
+    with pytest.raises(RequestCancelled):
+        asyncio.run(
+            api._invoke_executor_async(
+                executor, {"input": "x"}, deadline, DisconnectedRequest()
+            )
+        )
+    assert deadline.reason == "disconnect"
+    assert executor.stopped.wait(1)
+    assert executor.completed < executor.steps
+    assert deadlines.cancellation_stats()["disconnects"] == 1
+
+
+def test_stream_stops_at_deadline(monkeypatch):
+    executor = CooperativeExecutor()
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    client = TestClient(api.app)
+
+    events = []
+    with client.stream(
+        "POST", "/v1/invoke/stream", json={"input": "hi", "timeout_ms": 100}
+    ) as r:
+        for line in r.iter_lines():
+            if line.startswith("data:"):
+                events.append(json.loads(line[len("data:") :]))
+
+    assert "error" in events[-1]
+    assert executor.completed < executor.steps
+    assert deadlines.cancellation_stats()["streams_cancelled"] == 1
+
+
+def test_stream_executor_error_is_not_a_disconnect(monkeypatch):
+    class FailingExecutor:
+        def invoke(self, payload):
+            raise ValueError("boom")
+
+    monkeypatch.setattr(api, "get_executor", lambda: FailingExecutor())
+    client = TestClient(api.app)
+
+    with client.stream("POST", "/v1/invoke/stream", json={"input": "hi"}) as r:
+        events = [
+            json.loads(line[len("data:") :])
+            for line in r.iter_lines()
+            if line.startswith("data:")
+        ]
+
+    assert events == [{"error": "boom"}]
+    stats = deadlines.cancellation_stats()
+    assert stats["disconnects"] == 0 and stats["streams_cancelled"] == 0
+
+
+def test_fallback_executor_skips_tool_when_cancelled():
+    executor = _FallbackExecutor(tools=[{"name": "t", "func": lambda s: s}])
+    deadline = Deadline()
+    deadline.cancel("disconnect")
+    with pytest.raises(RequestCancelled):
+        run_in_scope(deadline, executor.invoke, {"input": "x"})
+    assert deadlines.cancellation_stats()["tool_calls_skipped"] == 1
+
+
+def test_llm_http_timeout_clamped_to_deadline():
+    request = httpx.Request("POST", "http://llm.invalid/v1/chat/completions")
+    request.extensions["timeout"] = {
+        "connect": 5.0,
+        "read": 60.0,
+        "write": 60.0,
+        "pool": 60.0,
+    }
+    with deadline_scope(Deadline(0.5)):
+        llm_http._apply_deadline(request)
+    assert all(v <= 0.5 for v in request.extensions["timeout"].values())
+
+
+def test_executor_checkpoints_llm_calls(scripted_agent):
+    executor = scripted_agent(resilient=False, verbose=False)
+    deadline = Deadline()
+    deadline.cancel()
+    with pytest.raises(RequestCancelled):
+        run_in_scope(deadline, executor.invoke, {"input": "x", "chat_history": []})
+    # raised from the handler at chat model start, before any agent action
+    stats = deadlines.cancellation_stats()
+    assert stats["llm_calls_skipped"] == 1 and stats["iterations_skipped"] == 0
+
+
+def test_executor_checkpoints_tool_calls(scripted_agent):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    deadline = Deadline()
+
+    class CancelAfterAction(BaseCallbackHandler):
+        # runs after the executor's own handlers have passed the action
+        def on_agent_action(self, *args, **kwargs):
+            deadline.cancel()
+
+    executor = scripted_agent(resilient=False, verbose=False)
+    with pytest.raises(RequestCancelled):
+        run_in_scope(
+            deadline,
+            executor.invoke,
+            {"input": "x", "chat_history": []},
+            config={"callbacks": [CancelAfterAction()]},
+        )
+    assert deadlines.cancellation_stats()["tool_calls_skipped"] == 1
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from jobs import FAILED, RUNNING, SUCCEEDED, JobManager, JobStore, QueueFull
+
+
+class GatedExecutor:
+    """Executor that blocks until released, to observe queued/running jobs."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def invoke(self, payload):
+        self.release.wait(5)
+        if payload.get("input") == "boom":
+            raise RuntimeError("agent failed")
+        return {"output": f"job: {payload.get('input')}", "used_tools": []}
+
+
+def _wait_for(manager, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job and job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {statuses}")
+
+
+@pytest.fixture
+def executor():
+    ex = GatedExecutor()
+    yield ex
+    ex.release.set()
+
+
+@pytest.fixture
+def manager(tmp_path, executor):
+    m = JobManager(JobStore(str(tmp_path / "jobs.db")), lambda: executor)
+    yield m
+    m.shutdown()
+
+
+@pytest.fixture
+def client(monkeypatch, manager):
+    monkeypatch.setattr(api, "get_job_manager", lambda: manager)
+    return TestClient(api.app)
+
+
+def test_submit_returns_immediately_and_poll_result(client, executor, manager):
+    r = client.post("/v1/jobs", json={"input": "hello"})
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] in ("queued", "running") and job["result"] is None
+
+    executor.release.set()
+    _wait_for(manager, job["id"], (SUCCEEDED,))
+    r2 = client.get(f"/v1/jobs/{job['id']}")
+    assert r2.status_code == 200
+    assert r2.json()["result"]["output"] == "job: hello"
+
+
+def test_failed_job_records_error(client, executor, manager):
+    executor.release.set()
+    job_id = client.post("/v1/jobs", json={"input": "boom"}).json()["id"]
+    job = _wait_for(manager, job_id, (FAILED,))
+    assert job["error"] == "agent failed"
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/v1/jobs/nope").status_code == 404
+    assert client.get("/v1/jobs/nope/events").status_code == 404
+
+
+def test_queue_is_bounded(tmp_path, executor):
+    manager = JobManager(
+        JobStore(str(tmp_path / "jobs.db")), lambda: executor, workers=1, max_queue=2
+    )
+    try:
+        manager.submit({"input": "a"})
+        manager.submit({"input": "b"})
+        with pytest.raises(QueueFull):
+            manager.submit({"input": "c"})
+    finally:
+        executor.release.set()
+        manager.shutdown()
+
+
+def test_queue_full_maps_to_429(client, monkeypatch, manager):
+    def full(*args, **kwargs):
+        raise QueueFull("job queue is full")
+
+    monkeypatch.setattr(manager, "submit", full)
+    assert client.post("/v1/jobs", json={"input": "x"}).status_code == 429
+
+
+def test_results_persist_and_expire(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path, ttl=60)
+    job = store.create({"input": "x"})
+    store.update(job["id"], SUCCEEDED, result={"output": "y"})
+    store.close()
+
+    reopened = JobStore(path, ttl=0)
+    assert reopened.get(job["id"])["result"] == {"output": "y"}
+    reopened.update(job["id"], SUCCEEDED, result={"output": "y"})
+    assert reopened.get(job["id"]) is None
+    assert reopened.purge_expired() == 1
+
+
+def test_long_running_job_outlives_ttl(tmp_path):
+    class SlowExecutor:
+        def invoke(self, payload):
+            time.sleep(0.6)
+            return {"output": "slow", "used_tools": []}
+
+    store = JobStore(str(tmp_path / "jobs.db"), ttl=0.3)
+    manager = JobManager(store, lambda: SlowExecutor())
+    try:
+        job = manager.submit({"input": "slow"})
+        time.sleep(0.4)
+        # purges expired jobs, which must not include the running one
+        manager.submit({"input": "other"})
+        assert manager.get(job["id"])["status"] == RUNNING
+        done = _wait_for(manager, job["id"], (SUCCEEDED,))
+        assert done["result"]["output"] == "slow"
+    finally:
+        manager.shutdown()
+
+
+def test_restart_fails_jobs_left_unfinished(tmp_path, executor):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    queued = store.create({"input": "queued"})
+    running = store.create({"input": "running"})
+    store.update(running["id"], RUNNING)
+    done = store.create({"input": "done"})
+    store.update(done["id"], SUCCEEDED, result={"output": "ok"})
+    store.close()
+
+    manager = JobManager(JobStore(path), lambda: executor)
+    try:
+        for job_id in (queued["id"], running["id"]):
+            job = manager.get(job_id)
+            assert job["status"] == FAILED
+            assert job["error"] == "interrupted by restart"
+        assert manager.get(done["id"])["status"] == SUCCEEDED
+    finally:
+        manager.shutdown()
+
+
+def test_event_stream_reports_status_changes(client, executor, monkeypatch):
+    monkeypatch.setattr(api, "JOB_POLL_INTERVAL", 0.01)
+    job_id = client.post("/v1/jobs", json={"input": "stream"}).json()["id"]
+    threading.Timer(0.1, executor.release.set).start()
+
+    events = []
+    with client.stream("GET", f"/v1/jobs/{job_id}/events") as r:
+        for line in r.iter_lines():
+            if line.startswith("data:"):
+                events.append(json.loads(line[len("data:") :]))
+
+    statuses = [e["status"] for e in events]
+    assert statuses[-1] == "succeeded"
+    assert "running" in statuses
+    assert events[-1]["result"]["output"] == "job: stream"
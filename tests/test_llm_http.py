@@ -0,0 +1,142 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent
+import api
+import llm_http
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    llm_http.close_http_clients()
+    yield
+    llm_http.close_http_clients()
+
+
+def test_shared_client_is_singleton():
+    assert llm_http.get_http_client() is llm_http.get_http_client()
+    assert llm_http.get_async_http_client() is llm_http.get_async_http_client()
+
+
+def test_pool_limits_from_env(monkeypatch):
+    monkeypatch.setenv("AGENT_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("AGENT_HTTP_MAX_KEEPALIVE", "3")
+    limits = llm_http.pool_limits()
+    assert limits.max_connections == 7
+    assert limits.max_keepalive_connections == 3
+
+
+def test_connections_are_reused(local_server):
+    client = llm_http.get_http_client()
+    for _ in range(5):
+        r = client.post(f"{local_server}/v1/chat/completions", json={"x": 1})
+        assert r.status_code == 200
+
+    stats = llm_http.pool_stats()
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["reused_requests"] == 4
+
+
+def test_async_client_keeps_one_pool_per_event_loop(local_server):
+    client = llm_http.get_async_http_client()
+
+    async def call():
+        r = await client.post(f"{local_server}/v1/chat/completions", json={"x": 1})
+        assert r.status_code == 200
+        return llm_http._loop_client()
+
+    # separate asyncio.run calls must not reuse connections of a dead loop
+    first = asyncio.run(call())
+    second = asyncio.run(call())
+    assert first is not second
+    assert llm_http.pool_stats()["requests"] == 2
+
+
+def test_app_shutdown_closes_clients():
+    with TestClient(api.app) as client:
+        client.get("/v1/metrics")
+        sync_client = llm_http.get_http_client()
+        facade = llm_http.get_async_http_client()
+    assert sync_client.is_closed and facade.is_closed
+    assert llm_http.get_http_client() is not sync_client
+
+
+def test_build_agent_injects_shared_clients(monkeypatch):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.runnables import RunnableLambda
+    from langchain_core.tools import Tool
+
+    created = []
+
+    def fake_chat(**kwargs):
+        created.append(kwargs)
+        return RunnableLambda(lambda x: x)
+
+    class FakeExecutor:
+        def __init__(self, agent, tools, verbose, **kwargs):
+            self.agent = agent
+            self.tools = tools
+
+        def with_config(self, **kwargs):
+            return self
+
+    monkeypatch.setattr(
+        agent,
+        "_import_langchain_components",
+        lambda: {
+            "ChatOpenAI": fake_chat,
+            "AgentExecutor": FakeExecutor,
+            "format_to_openai_function_messages": lambda steps: [],
+            "OpenAIFunctionsAgentOutputParser": lambda: RunnableLambda(lambda x: x),
+            "ChatPromptTemplate": ChatPromptTemplate,
+            "MessagesPlaceholder": MessagesPlaceholder,
+            "Tool": Tool,
+        },
+    )
+
+    first = agent.build_agent()
+    second = agent.build_agent()
+    assert isinstance(first, FakeExecutor) and isinstance(second, FakeExecutor)
+    assert len(created) == 2
+    assert created[0]["http_client"] is created[1]["http_client"]
+    assert created[0]["http_client"] is llm_http.get_http_client()
+    assert created[0]["http_async_client"] is llm_http.get_async_http_client()
+
+
+def test_metrics_endpoint():
+    client = TestClient(api.app)
+    r = client.get("/v1/metrics")
+    assert r.status_code == 200
+    assert "reuse_ratio" in r.json()["http_pool"]
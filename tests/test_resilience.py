@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import resilience
+from resilience import LatencyTracker, ResilientLLM, RetryBudget
+
+
+class MockBackend:
+    """LLM stand-in whose per-call latency and failures are scripted."""
+
+    def __init__(self, delays=None, errors=None):
+        self.delays = list(delays or [])
+        self.errors = list(errors or [])
+        self.calls = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+        delay = self.delays[n] if n < len(self.delays) else 0.0
+        error = self.errors[n] if n < len(self.errors) else None
+        return n, delay, error
+
+    def invoke(self, input, config=None):
+        n, delay, error = self._next()
+        time.sleep(delay)
+        if error:
+            raise error
+        return f"answer-{n}: {input}"
+
+    async def ainvoke(self, input, config=None):
+        n, delay, error = self._next()
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if error:
+            raise error
+        return f"answer-{n}: {input}"
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    resilience.reset_resilience_stats()
+    yield
+
+
+def test_no_hedge_when_fast():
+    backend = MockBackend(delays=[0.0])
+    llm = ResilientLLM(backend, hedge_initial_delay=0.2)
+    assert llm.invoke("q") == "answer-0: q"
+    assert backend.calls == 1
+    assert resilience.resilience_stats()["hedges"] == 0
+
+
+def test_hedge_wins_over_slow_primary():
+    backend = MockBackend(delays=[1.0, 0.0])
+    llm = ResilientLLM(backend, hedge_initial_delay=0.05)
+    start = time.monotonic()
+    assert llm.invoke("q") == "answer-1: q"
+    assert time.monotonic() - start < 0.5
+    stats = resilience.resilience_stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """Replace the shared attempt pool with one of `n` workers."""
+    pools = []
+
+    def make(n):
+        pool = ThreadPoolExecutor(max_workers=n)
+        pools.append(pool)
+        monkeypatch.setattr(resilience, "_POOL", pool)
+        monkeypatch.setattr(resilience, "_POOL_WORKERS", n)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def test_hedge_timer_starts_when_attempt_runs(small_pool):
+    small_pool(2)
+    blockers = [resilience._submit(lambda: time.sleep(0.2)) for _ in range(2)]
+    backend = MockBackend(delays=[0.0])
+    llm = ResilientLLM(backend, hedge_initial_delay=0.05)
+    # queued behind the blockers for 0.2s, then answers immediately
+    assert llm.invoke("q") == "answer-0: q"
+    assert backend.calls == 1
+    stats = resilience.resilience_stats()
+    assert stats["hedges"] == 0 and stats["hedges_skipped_busy"] == 0
+    for blocker in blockers:
+        blocker.result()
+
+
+def test_no_hedge_when_pool_saturated(small_pool):
+    small_pool(1)
+    backend = MockBackend(delays=[0.2, 0.0])
+    llm = ResilientLLM(backend, hedge_initial_delay=0.05)
+    assert llm.invoke("q") == "answer-0: q"
+    assert backend.calls == 1
+    assert resilience.resilience_stats()["hedges_skipped_busy"] == 1
+
+
+def test_hedge_budget_limits_hedges():
+    backend = MockBackend(delays=[0.3, 0.0, 0.3])
+    llm = ResilientLLM(
+        backend,
+        hedge_initial_delay=0.05,
+        hedge_budget=RetryBudget(ratio=0.0, reserve=1.0),
+    )
+    assert llm.invoke("q") == "answer-1: q"
+    assert llm.invoke("q") == "answer-2: q"
+    stats = resilience.resilience_stats()
+    assert stats["hedges"] == 1 and stats["hedges_denied"] == 1
+
+
+def test_hedge_delay_follows_observed_percentile():
+    tracker = LatencyTracker(min_samples=5)
+    for s in (0.1, 0.1, 0.1, 0.1, 0.4):
+        tracker.record(s)
+    llm = ResilientLLM(MockBackend(), hedge_percentile=50, latency=tracker)
+    assert llm.hedge_delay() == pytest.approx(0.1)
+    assert ResilientLLM(MockBackend(), hedge_percentile=0).hedge_delay() is None
+
+
+def test_async_hedge_cancels_loser():
+    backend = MockBackend(delays=[1.0, 0.0])
+    llm = ResilientLLM(backend, hedge_initial_delay=0.05)
+    assert asyncio.run(llm.ainvoke("q")) == "answer-1: q"
+    assert backend.cancelled == 1
+
+
+def test_retries_transient_errors():
+    backend = MockBackend(errors=[TimeoutError("slow"), ConnectionError("reset")])
+    llm = ResilientLLM(backend, hedge_percentile=0, backoff_base=0.001)
+    assert llm.invoke("q") == "answer-2: q"
+    assert resilience.resilience_stats()["retries"] == 2
+
+
+def test_does_not_retry_permanent_errors():
+    backend = MockBackend(errors=[ValueError("bad request")])
+    llm = ResilientLLM(backend, hedge_percentile=0)
+    with pytest.raises(ValueError):
+        llm.invoke("q")
+    assert backend.calls == 1
+
+
+def test_retry_budget_limits_retries():
+    backend = MockBackend(errors=[TimeoutError()] * 10)
+    budget = RetryBudget(ratio=0.0, reserve=1.0)
+    llm = ResilientLLM(
+        backend,
+        hedge_percentile=0,
+        max_attempts=5,
+        backoff_base=0.001,
+        retry_budget=budget,
+    )
+    with pytest.raises(TimeoutError):
+        llm.invoke("q")
+    assert backend.calls == 2
+    stats = resilience.resilience_stats()
+    assert stats["retries"] == 1 and stats["retries_denied"] == 1
+
+
+def test_wrap_llm_composes_in_pipeline():
+    from langchain_core.runnables import RunnableLambda
+
+    backend = MockBackend()
+    chain = RunnableLambda(lambda x: x.upper()) | resilience.wrap_llm(
+        backend, ResilientLLM(backend, hedge_percentile=0)
+    )
+    assert chain.invoke("q") == "answer-0: Q"
+    assert asyncio.run(chain.ainvoke("r")) == "answer-1: R"
@@ -0,0 +1,214 @@
+import threading
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import api
+import deadlines
+import semantic_cache
+from semantic_cache import HashingEmbedder, SemanticCache
+
+
+class CountingExecutor:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, payload):
+        self.calls += 1
+        return {"output": f"answer: {payload.get('input')}", "used_tools": []}
+
+
+def test_paraphrase_hits_and_unrelated_misses():
+    cache = SemanticCache(HashingEmbedder(), threshold=0.9)
+    cache.store("What is the capital of France?", {"output": "Paris"})
+
+    hit = cache.lookup("What is the capital city of France?")
+    assert hit.hit and hit.value == {"output": "Paris"}
+    assert hit.similarity >= 0.9 and hit.lookup_ms >= 0
+
+    miss = cache.lookup("Tell me a joke about cats")
+    assert not miss.hit and miss.similarity < 0.9
+
+
+def test_batched_search_returns_best_match_per_query():
+    cache = SemanticCache(HashingEmbedder())
+    texts = ["alpha beta", "gamma delta", "epsilon zeta"]
+    for i, t in enumerate(texts):
+        cache.store(t, i)
+    idx, scores = cache.search(cache.embed(list(reversed(texts))))
+    assert idx.tolist() == [2, 1, 0]
+    assert np.allclose(scores, 1.0, atol=1e-5)
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.99)
+    cache.store("first question", 1)
+    cache.store("second question", 2)
+    assert cache.lookup("first question").hit  # refresh "first"
+    cache.store("third question", 3)
+
+    assert len(cache) == 2
+    assert cache.lookup("first question").value == 1
+    assert cache.lookup("third question").value == 3
+    assert not cache.lookup("second question").hit
+
+
+def test_lookup_is_atomic_with_concurrent_store():
+    class RacingCache(SemanticCache):
+        """Starts an evicting store while the lookup is mid-search."""
+
+        def _search(self, queries):
+            result = super()._search(queries)
+            if self.racer is None:
+                self.racer = threading.Thread(
+                    target=self.store, args=("unrelated question", "wrong")
+                )
+                self.racer.start()
+                time.sleep(0.05)  # the store now waits for the lock
+            return result
+
+    cache = RacingCache(HashingEmbedder(), capacity=1, threshold=0.99)
+    cache.racer = None
+    cache.store("original question", "right")
+    assert cache.lookup("original question").value == "right"
+    cache.racer.join()
+    assert cache.lookup("unrelated question").value == "wrong"
+
+
+def test_persists_through_memory_mapped_files(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SemanticCache(HashingEmbedder(), path=path, capacity=8, threshold=0.99)
+    cache.store("persist me", {"output": "stored"})
+    cache.flush()
+
+    reloaded = SemanticCache(HashingEmbedder(), path=path, capacity=8, threshold=0.99)
+    assert isinstance(reloaded._vectors, np.memmap)
+    assert reloaded.lookup("persist me").value == {"output": "stored"}
+
+
+def test_unflushed_eviction_never_pairs_vector_with_old_answer(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SemanticCache(HashingEmbedder(), path=path, capacity=1, threshold=0.99)
+    cache.store("What is the capital of France?", {"output": "Paris"})
+    cache.flush()
+    cache.store("how do I delete my account", {"output": "Settings"})
+    # process dies here, before the next flush
+
+    reloaded = SemanticCache(HashingEmbedder(), path=path, capacity=1, threshold=0.99)
+    assert not reloaded.lookup("how do I delete my account").hit
+    assert reloaded.lookup("What is the capital of France?").value == {
+        "output": "Paris"
+    }
+
+
+def test_concurrent_flushes_leave_a_consistent_snapshot(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SemanticCache(HashingEmbedder(), path=path, capacity=64, flush_every=1)
+    questions = [f"question number {i} about topic {i * 7}" for i in range(32)]
+    threads = [
+        threading.Thread(target=cache.store, args=(q, {"output": q})) for q in questions
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cache.flush()
+
+    reloaded = SemanticCache(HashingEmbedder(), path=path, capacity=64)
+    for q in questions:
+        assert reloaded.lookup(q).value == {"output": q}
+
+
+def test_custom_embedder_is_used():
+    class FixedEmbedder:
+        def embed(self, texts):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    cache = SemanticCache(embedder=FixedEmbedder())
+    cache.store("anything", "cached")
+    assert cache.lookup("something else entirely").value == "cached"
+
+
+def test_invoke_reports_cache_metadata(monkeypatch):
+    executor = CountingExecutor()
+    cache = SemanticCache(embedder=HashingEmbedder(), threshold=0.9)
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    monkeypatch.setattr(api, "get_semantic_cache", lambda: cache)
+    client = TestClient(api.app)
+
+    r1 = client.post("/v1/invoke", json={"input": "What is the capital of France?"})
+    assert r1.json()["metadata"]["semantic_cache"]["hit"] is False
+
+    r2 = client.post(
+        "/v1/invoke", json={"input": "What is the capital city of France?"}
+    )
+    meta = r2.json()["metadata"]["semantic_cache"]
+    assert meta["hit"] is True and meta["similarity"] >= 0.9
+    assert "lookup_ms" in meta
+    assert r2.json()["output"] == "answer: What is the capital of France?"
+    assert executor.calls == 1
+
+
+class FailingCache(SemanticCache):
+    def __init__(self, fail_lookup=False, fail_store=False):
+        super().__init__(HashingEmbedder())
+        self.fail_lookup = fail_lookup
+        self.fail_store = fail_store
+
+    def lookup(self, text):
+        if self.fail_lookup:
+            raise RuntimeError("embeddings endpoint down")
+        return super().lookup(text)
+
+    def store(self, text, value, vector=None):
+        if self.fail_store:
+            raise OSError("disk full")
+        super().store(text, value, vector)
+
+
+def test_cache_errors_do_not_fail_invoke(monkeypatch):
+    executor = CountingExecutor()
+    monkeypatch.setattr(api, "get_executor", lambda: executor)
+    client = TestClient(api.app)
+
+    for cache in (FailingCache(fail_lookup=True), FailingCache(fail_store=True)):
+        monkeypatch.setattr(api, "get_semantic_cache", lambda cache=cache: cache)
+        r = client.post("/v1/invoke", json={"input": "hello"})
+        assert r.status_code == 200 and r.json()["output"] == "answer: hello"
+    assert executor.calls == 2
+
+
+def test_lookup_runs_within_request_deadline(monkeypatch):
+    seen = []
+
+    class DeadlineEmbedder(HashingEmbedder):
+        def embed(self, texts):
+            seen.append(deadlines.remaining_timeout())
+            return super().embed(texts)
+
+    cache = SemanticCache(DeadlineEmbedder())
+    monkeypatch.setattr(api, "get_executor", lambda: CountingExecutor())
+    monkeypatch.setattr(api, "get_semantic_cache", lambda: cache)
+    client = TestClient(api.app)
+
+    client.post("/v1/invoke", json={"input": "hello", "timeout_ms": 5000})
+    assert seen and 0 < seen[0] <= 5
+
+
+def test_production_cache_uses_real_embedder_by_default(monkeypatch):
+    class FakeOpenAIEmbedder:
+        def embed(self, texts):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setattr(semantic_cache, "OpenAIEmbedder", FakeOpenAIEmbedder)
+    monkeypatch.setattr(api, "_semantic_cache", None)
+    monkeypatch.setenv("AGENT_SEMANTIC_CACHE", "1")
+    monkeypatch.delenv("AGENT_SEMANTIC_CACHE_EMBEDDER", raising=False)
+    monkeypatch.delenv("AGENT_SEMANTIC_CACHE_PATH", raising=False)
+    assert isinstance(api.get_semantic_cache().embedder, FakeOpenAIEmbedder)
+
+
+def test_cache_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("AGENT_SEMANTIC_CACHE", raising=False)
+    assert api.get_semantic_cache() is None
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import time
+
+from slack_app import PLACEHOLDER_TEXT, SlackDispatcher, create_app
+
+
+class FakeSlackClient:
+    """Records the Web API calls the dispatcher makes."""
+
+    def __init__(self):
+        self.posts = []
+        self.updates = []
+
+    async def chat_postMessage(self, **kwargs):
+        self.posts.append(kwargs)
+        return {"ok": True, "ts": f"{len(self.posts)}.0001"}
+
+    async def chat_update(self, **kwargs):
+        self.updates.append(kwargs)
+        return {"ok": True}
+
+
+class RateLimitedError(Exception):
+    """Shaped like slack_sdk's SlackApiError for a 429 response."""
+
+    class Response(dict):
+        status_code = 429
+        headers = {"Retry-After": "0.2"}
+
+    def __init__(self):
+        super().__init__("ratelimited")
+        self.response = self.Response(ok=False, error="ratelimited")
+
+
+class SlowExecutor:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def invoke(self, payload):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"output": f"answer: {payload['input']}"}
+
+
+class StreamingExecutor:
+    def stream_invoke(self, payload):
+        for i in range(40):
+            time.sleep(0.005)
+            yield f"{i} "
+
+
+def _event(ts="1700000000.000100", text="<@U123> hello there", **extra):
+    return {"type": "app_mention", "channel": "C1", "ts": ts, "text": text, **extra}
+
+
+def test_handle_event_returns_before_work_is_done():
+    async def scenario():
+        client = FakeSlackClient()
+        executor = SlowExecutor()
+        dispatcher = SlackDispatcher(lambda: executor, client)
+
+        start = time.monotonic()
+        assert dispatcher.handle_event(_event(), "Ev1") is True
+        assert time.monotonic() - start < 0.05
+
+        await dispatcher.join()
+        await dispatcher.close()
+        return client, executor
+
+    client, executor = asyncio.run(scenario())
+    assert executor.calls == 1
+    assert client.posts[0]["text"] == PLACEHOLDER_TEXT
+    assert client.posts[0]["thread_ts"] == "1700000000.000100"
+    assert client.updates[-1]["text"] == "answer: hello there"
+
+
+def test_slack_retries_are_deduplicated():
+    async def scenario():
+        client = FakeSlackClient()
+        executor = SlowExecutor(delay=0)
+        dispatcher = SlackDispatcher(lambda: executor, client)
+        dispatcher.handle_event(_event(), "Ev1")
+        dispatcher.handle_event(_event(), "Ev1")  # Slack retry
+        dispatcher.handle_event(_event(ts="2.0"), "Ev2")
+        await dispatcher.join()
+        await dispatcher.close()
+        return dispatcher, executor
+
+    dispatcher, executor = asyncio.run(scenario())
+    assert executor.calls == 2
+    assert dispatcher.stats["duplicates"] == 1
+
+
+def test_bot_messages_are_ignored():
+    async def scenario():
+        dispatcher = SlackDispatcher(lambda: SlowExecutor(0), FakeSlackClient())
+        queued = dispatcher.handle_event(_event(bot_id="B1"), "Ev1")
+        await dispatcher.close()
+        return queued
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_queue_is_bounded():
+    async def scenario():
+        dispatcher = SlackDispatcher(
+            lambda: SlowExecutor(0), FakeSlackClient(), workers=1, max_queue=1
+        )
+        results = [dispatcher.handle_event(_event(), f"Ev{i}") for i in range(3)]
+        await dispatcher.join()
+        await dispatcher.close()
+        return dispatcher, results
+
+    dispatcher, results = asyncio.run(scenario())
+    assert results == [True, False, False]
+    assert dispatcher.stats["dropped"] == 2
+
+
+def test_retry_of_dropped_event_is_accepted():
+    async def scenario():
+        executor = SlowExecutor(0)
+        dispatcher = SlackDispatcher(
+            lambda: executor, FakeSlackClient(), workers=1, max_queue=1
+        )
+        first = dispatcher.handle_event(_event(), "Ev1")
+        dropped = dispatcher.handle_event(_event(ts="2.0"), "Ev2")
+        await dispatcher.join()
+        retried = dispatcher.handle_event(_event(ts="2.0"), "Ev2")  # Slack retry
+        await dispatcher.join()
+        await dispatcher.close()
+        return dispatcher, executor, (first, dropped, retried)
+
+    dispatcher, executor, results = asyncio.run(scenario())
+    assert results == (True, False, True)
+    assert executor.calls == 2 and dispatcher.stats["duplicates"] == 0
+
+
+def test_updates_share_one_rate_limit():
+    class TimedClient(FakeSlackClient):
+        async def chat_update(self, **kwargs):
+            kwargs["at"] = time.monotonic()
+            return await super().chat_update(**kwargs)
+
+    async def scenario():
+        client = TimedClient()
+        dispatcher = SlackDispatcher(
+            lambda: SlowExecutor(0), client, updates_per_minute=1200
+        )
+        for i in range(4):
+            dispatcher.handle_event(_event(ts=f"{i}.0"), f"Ev{i}")
+        await dispatcher.join()
+        await dispatcher.close()
+        return client
+
+    client = asyncio.run(scenario())
+    times = sorted(u["at"] for u in client.updates)
+    assert len(times) == 4
+    # 1200/min allows one edit every 50ms across all messages
+    assert all(b - a >= 0.045 for a, b in zip(times, times[1:], strict=False))
+
+
+def test_rate_limited_update_waits_for_retry_after():
+    class LimitedClient(FakeSlackClient):
+        async def chat_update(self, **kwargs):
+            kwargs["at"] = time.monotonic()
+            if not self.updates:
+                self.updates.append(kwargs)
+                raise RateLimitedError()
+            return await super().chat_update(**kwargs)
+
+    async def scenario():
+        client = LimitedClient()
+        dispatcher = SlackDispatcher(
+            lambda: SlowExecutor(0), client, updates_per_minute=6000
+        )
+        dispatcher.handle_event(_event(), "Ev1")
+        await dispatcher.join()
+        await dispatcher.close()
+        return dispatcher, client
+
+    dispatcher, client = asyncio.run(scenario())
+    rejected, delivered = client.updates
+    assert delivered["text"] == "answer: hello there"
+    assert delivered["at"] - rejected["at"] >= 0.19
+    assert dispatcher.stats["rate_limited"] == 1
+    assert dispatcher.stats["updates"] == 1
+
+
+def test_streamed_answers_are_batched():
+    async def scenario():
+        client = FakeSlackClient()
+        dispatcher = SlackDispatcher(
+            lambda: StreamingExecutor(),
+            client,
+            update_interval=0.05,
+            updates_per_minute=6000,
+        )
+        dispatcher.handle_event(_event(), "Ev1")
+        await dispatcher.join()
+        await dispatcher.close()
+        return client
+
+    client = asyncio.run(scenario())
+    # 40 pieces over ~0.2s+ must collapse into a handful of edits
+    assert 2 <= len(client.updates) < 20
+    assert client.updates[-1]["text"] == "".join(f"{i} " for i in range(40))
+
+
+def test_bolt_app_routes_events_to_dispatcher():
+    from slack_bolt.authorization import AuthorizeResult
+    from slack_bolt.request.async_request import AsyncBoltRequest
+
+    async def authorize(**kwargs):
+        return AuthorizeResult(enterprise_id=None, team_id="T1", bot_token="xoxb-x")
+
+    async def scenario():
+        client = FakeSlackClient()
+        executor = SlowExecutor(delay=0)
+        dispatcher = SlackDispatcher(lambda: executor, client)
+        app = create_app(
+            dispatcher,
+            signing_secret="secret",
+            authorize=authorize,
+            request_verification_enabled=False,
+        )
+        body = {
+            "type": "event_callback",
+            "team_id": "T1",
+            "event_id": "Ev42",
+            "event": _event(),
+        }
+        request = AsyncBoltRequest(
+            body=json.dumps(body), headers={"content-type": ["application/json"]}
+        )
+        response = await app.async_dispatch(request)
+        await asyncio.sleep(0.05)  # listener runs after the ack
+        await dispatcher.join()
+        await dispatcher.close()
+        return response, executor
+
+    response, executor = asyncio.run(scenario())
+    assert response.status == 200
+    assert executor.calls == 1
@@ -0,0 +1,139 @@
+import asyncio
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+import static_assets
+from static_assets import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    PrecompressedStaticFiles,
+    precompress_directory,
+)
+
+JS = ("console.log('hello from the bundled web ui');\n" * 200).encode()
+HTML = b"<!doctype html><html><body>" + b"<div>ui</div>" * 100 + b"</body></html>"
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "index-DiwrgTda.js").write_bytes(JS)
+    (tmp_path / "index.html").write_bytes(HTML)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + b"\x00" * 600)
+    precompress_directory(str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def static(dist):
+    return PrecompressedStaticFiles(directory=str(dist), html=True)
+
+
+@pytest.fixture
+def client(static):
+    app = Starlette(routes=[Mount("/", static)])
+    return TestClient(app)
+
+
+def test_precompress_writes_smaller_variants(dist):
+    gz = (dist / "assets" / "index-DiwrgTda.js.gz").read_bytes()
+    assert gzip.decompress(gz) == JS and len(gz) < len(JS)
+    assert not (dist / "logo.png.gz").exists()
+    if static_assets.brotli is not None:
+        assert (dist / "assets" / "index-DiwrgTda.js.br").exists()
+
+
+def test_serves_gzip_variant_when_accepted(client):
+    r = client.get("/assets/index-DiwrgTda.js", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["content-type"].startswith(("text/javascript", "application/"))
+    assert int(r.headers["content-length"]) < len(JS)
+    assert r.content == JS  # httpx transparently decodes
+
+
+def test_prefers_brotli(client):
+    if static_assets.brotli is None:
+        pytest.skip("brotli not installed")
+    r = client.get("/assets/index-DiwrgTda.js", headers={"Accept-Encoding": "gzip, br"})
+    assert r.headers["content-encoding"] == "br"
+
+
+def test_identity_when_not_accepted(client):
+    r = client.get("/assets/index-DiwrgTda.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert r.content == JS
+
+
+def test_cache_control_for_hashed_and_html(client):
+    asset = client.get("/assets/index-DiwrgTda.js")
+    assert asset.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    index = client.get("/")
+    assert index.status_code == 200
+    assert index.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_etag_revalidation_returns_304(client):
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get("/assets/index-DiwrgTda.js", headers=headers)
+    etag = first.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    again = client.get(
+        "/assets/index-DiwrgTda.js", headers={**headers, "If-None-Match": etag}
+    )
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert again.content == b""
+
+    # a different representation must not match
+    plain = client.get(
+        "/assets/index-DiwrgTda.js",
+        headers={"Accept-Encoding": "identity", "If-None-Match": etag},
+    )
+    assert plain.status_code == 200
+
+
+def test_small_files_served_from_memory(client, static):
+    for _ in range(3):
+        client.get("/index.html", headers={"Accept-Encoding": "gzip"})
+    assert static.stats["disk_reads"] == 1
+    assert static.stats["memory_hits"] == 2
+
+
+def test_cache_misses_are_read_off_the_event_loop(client, static, monkeypatch):
+    loop_running = []
+    load_body = static._load_body
+
+    def recording_load(path, st):
+        try:
+            asyncio.get_running_loop()
+            loop_running.append(True)
+        except RuntimeError:
+            loop_running.append(False)
+        return load_body(path, st)
+
+    monkeypatch.setattr(static, "_load_body", recording_load)
+    r = client.get("/index.html", headers={"Accept-Encoding": "identity"})
+    assert r.content == HTML and r.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert loop_running == [False]
+
+
+def test_large_files_stream_from_disk(dist):
+    static = PrecompressedStaticFiles(directory=str(dist), memory_cache_max_file=10)
+    client = TestClient(Starlette(routes=[Mount("/", static)]))
+    r = client.get("/assets/index-DiwrgTda.js", headers={"Accept-Encoding": "gzip"})
+    assert r.content == JS
+    assert static.stats["memory_hits"] == 0
+
+
+def test_head_request_has_length_but_no_body(client):
+    r = client.head("/index.html", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["content-length"] == str(len(HTML))
+    assert r.content == b""
@@ -0,0 +1,168 @@
+import io
+import json
+import logging
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent
+import api
+import structured_logging
+from structured_logging import (
+    configure_logging,
+    logging_stats,
+    reset_request_context,
+    set_request_context,
+    shutdown_logging,
+    trace_event,
+)
+
+
+class SlowStream(io.StringIO):
+    """Sink blocking each write until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, s):
+        self.release.wait(5)
+        return super().write(s)
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    """Route the pipeline to an in-memory stream; yields a reader of records."""
+    stream = io.StringIO()
+    shutdown_logging()
+    configure_logging(stream=stream, level="INFO")
+
+    def records():
+        shutdown_logging()  # flushes the queue
+        configure_logging(stream=stream, level="INFO")
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield records
+    shutdown_logging()
+    configure_logging()
+
+
+def test_records_are_json_lines_with_request_id(sink):
+    tokens = set_request_context("req-123")
+    try:
+        logging.getLogger("agent.test").info("hello", extra={"answer": 42})
+    finally:
+        reset_request_context(tokens)
+    logging.getLogger("agent.test").info("outside")
+
+    first, second = sink()
+    assert first["message"] == "hello" and first["answer"] == 42
+    assert first["request_id"] == "req-123" and first["logger"] == "agent.test"
+    assert second["request_id"] is None
+
+
+def test_slow_sink_does_not_block_and_drops(monkeypatch):
+    monkeypatch.setenv("AGENT_LOG_QUEUE_SIZE", "4")
+    stream = SlowStream()
+    shutdown_logging()
+    configure_logging(stream=stream, level="INFO")
+    try:
+        log = logging.getLogger("agent.test")
+        start = time.perf_counter()
+        for i in range(50):
+            log.info("record %d", i)
+        assert time.perf_counter() - start < 0.5
+        stats = logging_stats()
+        assert stats["dropped"] > 0
+        assert stats["enqueued"] + stats["dropped"] == 50
+    finally:
+        stream.release.set()
+        shutdown_logging()
+        configure_logging()
+
+
+def test_trace_event_only_when_sampled(sink):
+    trace_event("unsampled_step")
+    tokens = set_request_context("req-1", sampled=True)
+    try:
+        trace_event("sampled_step", tool="search")
+    finally:
+        reset_request_context(tokens)
+
+    records = sink()
+    assert [r["event"] for r in records] == ["sampled_step"]
+    assert records[0]["tool"] == "search" and records[0]["request_id"] == "req-1"
+
+
+def test_executor_traces_llm_and_tool_runs(sink, scripted_agent):
+    executor = scripted_agent(resilient=False, verbose=False)
+    tokens = set_request_context("req-2", sampled=True)
+    try:
+        out = executor.invoke({"input": "x", "chat_history": []})
+    finally:
+        reset_request_context(tokens)
+
+    assert out["output"] == "done"
+    records = [r for r in sink() if r["logger"] == "agent.trace"]
+    events = [r["event"] for r in records]
+    for event in ("llm_start", "llm_end", "tool_start", "tool_end", "agent_action"):
+        assert event in events
+    tool_end = next(r for r in records if r["event"] == "tool_end")
+    assert tool_end["request_id"] == "req-2" and tool_end["duration_ms"] >= 0
+    assert tool_end["output"] == "hi"
+
+
+def test_unsampled_requests_build_no_trace_payloads(sink, scripted_agent, monkeypatch):
+    previews = []
+    monkeypatch.setattr(
+        structured_logging, "_preview", lambda value, limit=500: previews.append(1)
+    )
+    executor = scripted_agent(resilient=False, verbose=False)
+    tokens = set_request_context("req-3", sampled=False)
+    try:
+        executor.invoke({"input": "x", "chat_history": []})
+    finally:
+        reset_request_context(tokens)
+
+    assert previews == []
+    assert not [r for r in sink() if r["logger"] == "agent.trace"]
+
+
+def test_middleware_echoes_and_logs_request_id(sink, monkeypatch):
+    monkeypatch.setenv("AGENT_TRACE_SAMPLE_RATE", "1")
+    client = TestClient(api.app)
+
+    r = client.get("/health", headers={"X-Request-ID": "abc"})
+    assert r.headers["x-request-id"] == "abc"
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
+
+    access = [r for r in sink() if r["logger"] == "agent.access"]
+    assert access[0]["request_id"] == "abc" and access[0]["status"] == 200
+    assert access[1]["request_id"] == generated
+
+
+def test_build_agent_routes_traces_off_stdout_by_default(monkeypatch):
+    def unavailable():
+        raise ImportError("langchain")
+
+    monkeypatch.setattr(agent, "_import_langchain_components", unavailable)
+    monkeypatch.delenv("AGENT_TRACE_TO_STDOUT", raising=False)
+    assert agent.build_agent().verbose is False
+    monkeypatch.setenv("AGENT_TRACE_TO_STDOUT", "1")
+    assert agent.build_agent().verbose is True
+
+
+def test_fallback_executor_does_not_print(capsys):
+    executor = agent._FallbackExecutor(verbose=True)
+    assert executor.invoke({"input": "x"})["output"]
+    assert capsys.readouterr().out == ""
+
+
+def test_should_sample_respects_rate(monkeypatch):
+    monkeypatch.setenv("AGENT_TRACE_SAMPLE_RATE", "0")
+    assert not any(structured_logging.should_sample() for _ in range(100))
+    monkeypatch.setenv("AGENT_TRACE_SAMPLE_RATE", "1")
+    assert all(structured_logging.should_sample() for _ in range(100))
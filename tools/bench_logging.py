@@ -0,0 +1,81 @@
+"""Benchmark per-request logging overhead: synchronous vs queued pipeline.
+
+Simulates requests that each emit a handful of agent trace records to a
+sink with a fixed write latency (a slow terminal, pipe or log shipper) and
+prints the time spent in logging calls per request.
+
+    python tools/bench_logging.py [--requests N] [--records N] [--sink-ms MS]
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Ensure the project root is on sys.path so we can import structured_logging
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import structured_logging  # noqa: E402
+
+
+class _SlowSink(io.TextIOBase):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, s):
+        time.sleep(self.delay)
+        return len(s)
+
+
+def _run(log: logging.Logger, requests: int, records: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        tokens = structured_logging.set_request_context(f"req-{i}", sampled=True)
+        try:
+            for step in range(records):
+                structured_logging.trace_event("tool_end", step=step, output="x" * 80)
+        finally:
+            structured_logging.reset_request_context(tokens)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--records", type=int, default=8)
+    parser.add_argument("--sink-ms", type=float, default=0.2)
+    args = parser.parse_args()
+    os.environ.setdefault("AGENT_LOG_QUEUE_SIZE", str(args.requests * args.records))
+    sink = _SlowSink(args.sink_ms / 1000)
+    log = structured_logging.logger
+
+    # Synchronous: what verbose stdout output costs on the request thread.
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(structured_logging.JsonFormatter())
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    sync_us = _run(log, args.requests, args.records)
+    log.removeHandler(handler)
+
+    structured_logging.configure_logging(stream=sink, level="INFO")
+    queued_us = _run(log, args.requests, args.records)
+    stats = structured_logging.logging_stats()
+    structured_logging.shutdown_logging()
+
+    print(
+        f"{args.requests} requests x {args.records} records, "
+        f"sink latency {args.sink_ms}ms/write"
+    )
+    print(f"{'handler':<14}{'us/request':>12}")
+    print(f"{'synchronous':<14}{sync_us:>12.1f}")
+    print(f"{'queued':<14}{queued_us:>12.1f}")
+    print(f"dropped: {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
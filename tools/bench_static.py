@@ -0,0 +1,120 @@
+"""Benchmark static asset serving: plain StaticFiles vs PrecompressedStaticFiles.
+
+Runs both apps in-process (no sockets) over the same request mix and prints
+requests/sec and response body bytes sent. Uses `webui_dist` when present,
+otherwise a synthetic Vite-like bundle.
+
+    python tools/bench_static.py [directory] [--requests N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure the project root is on sys.path so we can import static_assets
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+from static_assets import PrecompressedStaticFiles, precompress_directory  # noqa: E402
+
+
+def _synthetic_dist() -> str:
+    directory = tempfile.mkdtemp(prefix="bench-static-")
+    assets = os.path.join(directory, "assets")
+    os.makedirs(assets)
+    with open(os.path.join(assets, "index-DiwrgTda.js"), "w") as fh:
+        fh.write("export function render(n){return `<li>${n}</li>`}\n" * 4000)
+    with open(os.path.join(assets, "index-BkLmNoPq.css"), "w") as fh:
+        fh.write(".item{display:flex;margin:0 auto;padding:4px}\n" * 1500)
+    with open(os.path.join(directory, "index.html"), "w") as fh:
+        fh.write(
+            '<!doctype html><html><head><script type="module" '
+            'src="/assets/index-DiwrgTda.js"></script></head>'
+            '<body><div id="root"></div></body></html>\n'
+        )
+    return directory
+
+
+class _ByteCounter:
+    """ASGI wrapper counting response body bytes."""
+
+    def __init__(self, app):
+        self.app = app
+        self.bytes_sent = 0
+
+    async def __call__(self, scope, receive, send):
+        async def counting_send(message):
+            if message["type"] == "http.response.body":
+                self.bytes_sent += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send=counting_send)
+
+
+def _paths(directory: str):
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                continue
+            rel = os.path.relpath(os.path.join(root, name), directory)
+            paths.append("/" + rel.replace(os.sep, "/"))
+    return sorted(paths)
+
+
+async def _run(app, paths, total: int):
+    counter = _ByteCounter(app)
+    transport = httpx.ASGITransport(app=counter)
+    headers = {"Accept-Encoding": "gzip, deflate, br"}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=headers
+    ) as client:
+        etags = {}
+        start = time.perf_counter()
+        for i in range(total):
+            path = paths[i % len(paths)]
+            extra = {}
+            # every other round trip is a returning browser revalidating
+            if (i // len(paths)) % 2 and path in etags:
+                extra["If-None-Match"] = etags[path]
+            r = await client.get(path, headers=extra)
+            if "etag" in r.headers:
+                etags[path] = r.headers["etag"]
+        elapsed = time.perf_counter() - start
+    return total / elapsed, counter.bytes_sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", nargs="?", default=str(ROOT / "webui_dist"))
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = args.directory
+    if not os.path.isdir(directory):
+        directory = _synthetic_dist()
+    precompress_directory(directory)
+    paths = _paths(directory)
+
+    apps = {
+        "StaticFiles": StaticFiles(directory=directory, html=True),
+        "PrecompressedStaticFiles": PrecompressedStaticFiles(
+            directory=directory, html=True
+        ),
+    }
+    print(f"{len(paths)} files from {directory}, {args.requests} requests each")
+    print(f"{'server':<26}{'req/s':>10}{'bytes sent':>14}")
+    for name, app in apps.items():
+        rps, sent = asyncio.run(_run(app, paths, args.requests))
+        print(f"{name:<26}{rps:>10.0f}{sent:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+# Ensure the project root is on sys.path so we can import static_assets
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from static_assets import precompress_directory  # noqa: E402
+
+
+def main() -> None:
+    directory = sys.argv[1] if len(sys.argv) > 1 else str(ROOT / "webui_dist")
+    if not Path(directory).is_dir():
+        sys.exit(f"precompress: {directory} is not a directory")
+    written = precompress_directory(directory)
+    print(f"Precompressed {directory}: {written['gzip']} gzip, {written['br']} brotli")
+
+
+if __name__ == "__main__":
+    main()